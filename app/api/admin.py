@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session, joinedload, selectinload
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 
+from app.core.constants import GENERAL_CLUSTERS, GENERAL_CLUSTER_SET, SUB_CLUSTERS
 from app.core.dependencies import get_current_admin_user
 from app.db.models import Chat, Message, Reaction, User, MessageFile, Source # Import missing models
 from app.db.session import get_db
@@ -17,30 +18,6 @@ from app.schemas.user import User as UserSchema # Import base User schema
 router = APIRouter(prefix="/admin", tags=["Admin"])
 logger = logging.getLogger(__name__)
 
-general_clusters = [
-    'Общие вопросы о работе с системой', 'Процессы закупок', 'Работа с контрактами',
-    'Оферты и коммерческие предложения', 'Документы', 'Работа с категориями продукции',
-    'Техническая поддержка', 'Чаты и обсуждения', 'Финансовые операции',
-    'Новости и обновления', 'Регуляторные и юридические вопросы', 'Ошибки и предупреждения',
-    'Бессмысленный запрос'
-]
-
-sub_clusters = {
-    'Общие вопросы о работе с системой': ['Регистрация и вход в систему', 'Настройка личного кабинета', 'Поиск информации'],
-    'Процессы закупок': ['Прямые закупки', 'Котировочные сессии', 'Закупки по потребностям'],
-    'Работа с контрактами': ['Формирование и подписание контрактов', 'Исполнение контрактов'],
-    'Оферты и коммерческие предложения': ['Создание и редактирование оферт', 'Запросы на коммерческие предложения'],
-    'Документы': ['Добавление и удаление документов', 'Редактирование и обновление документации'],
-    'Работа с категориями продукции': ['Выбор конечной категории продукции', 'Использование справочников'],
-    'Техническая поддержка': ['Решение проблем с системой', 'Вопросы о доступности функций'],
-    'Чаты и обсуждения': ['Использование чатов', 'Обсуждение конкретных закупок и контрактов'],
-    'Финансовые операции': ['Банковские гарантии и финансовые инструменты', 'Логистика и связанные услуги'],
-    'Новости и обновления': ['Информация о новых возможностях портала', 'Новости о тендерах и закупках'],
-    'Регуляторные и юридические вопросы': ['Вопросы, связанные с нормативными документами', 'Правила участия в закупках'],
-    'Ошибки и предупреждения': ['Вопросы о неправильных действиях', 'Работа с блокировками или жалобами'],
-    'Бессмысленный запрос': []
-}
-
 def get_default_color(category):
     """Get default color for a category"""
     default_colors = {
@@ -76,11 +53,11 @@ def get_clusters_stats(
 
         if parentCluster:
             # Return sub-clusters for the given parent
-            if parentCluster not in sub_clusters:
+            if parentCluster not in SUB_CLUSTERS:
                 logger.warning(f"Unknown parent cluster requested: {parentCluster}")
                 return {"sub_clusters": []}
 
-            valid_subcategories = sub_clusters[parentCluster]
+            valid_subcategories = SUB_CLUSTERS[parentCluster]
             subcategory_counts = {sub: 0 for sub in valid_subcategories}
 
             for chat in chats: # Iterate only through filtered chats
@@ -100,7 +77,7 @@ def get_clusters_stats(
             return {"sub_clusters": sub_stats}
         else:
             # Return general clusters stats
-            category_counts = {cat: 0 for cat in general_clusters}
+            category_counts = {cat: 0 for cat in GENERAL_CLUSTERS}
             for chat in chats:
                 if chat.categories:
                     for cat in chat.categories:
@@ -190,7 +167,7 @@ def get_cluster_timeseries(
         # Process results into the timeseries format
         timeseries_dict: Dict[str, Dict[str, Any]] = {slot: {"date": slot} for slot in all_slots}
         for slot in timeseries_dict:
-            for gc in general_clusters:
+            for gc in GENERAL_CLUSTERS:
                 timeseries_dict[slot][gc] = 0 # Initialize all clusters to 0
 
         for row in results:
@@ -199,7 +176,7 @@ def get_cluster_timeseries(
             category = row['category']
             count = row['count']
 
-            if slot_str in timeseries_dict and category in general_clusters:
+            if slot_str in timeseries_dict and category in GENERAL_CLUSTER_SET:
                 timeseries_dict[slot_str][category] = count
 
         # Convert to list and sort
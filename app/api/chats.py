@@ -1,59 +1,120 @@
-import json
+import asyncio
 import logging
+import re
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
+import anyio.from_thread
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Body, BackgroundTasks
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 from starlette.concurrency import run_in_threadpool
 
-from app.api.websockets import broadcast_message_chunk, broadcast_message_complete, broadcast_message
+from app.api.websockets import queue_message_chunk, flush_message_chunks, broadcast_message_complete
 from app.core.dependencies import get_current_active_user, get_chat_by_id
-from app.db.session import get_db
-from app.db.models import User, Chat, Message, MessageStatus, MessageType, File, Source
+from app.db.session import get_db, SessionLocal
+from app.db.models import User, Chat, Message, MessageStatus, MessageType, File
 from app.schemas.chat import (
     Chat as ChatSchema,
     ChatCreate,
     ChatList,
+    ChatListItem,
     Message as MessageSchema,
     MessageCreate,
     MessageList,
-    ReactionCreate
+    ReactionCreate,
+    CallbackPayload
 )
 from app.services import chat_service, ai_service
 from app.tasks.message_tasks import update_message_status, save_completed_message, get_message_content_from_redis, \
+    get_messages_content_from_redis, \
+    save_message_suggestions_to_redis, get_message_suggestions_from_redis, \
     save_message_chunk_to_redis
 from app.core.config import settings
+from app.core.constants import SUB_TO_GENERAL
 
 router = APIRouter(prefix="/chats", tags=["Chats"])
 logger = logging.getLogger(__name__)
 
-# Define cluster mappings (same as used in admin)
-general_clusters = [
-    'Общие вопросы о работе с системой', 'Процессы закупок', 'Работа с контрактами',
-    'Оферты и коммерческие предложения', 'Документы', 'Работа с категориями продукции',
-    'Техническая поддержка', 'Чаты и обсуждения', 'Финансовые операции',
-    'Новости и обновления', 'Регуляторные и юридические вопросы', 'Ошибки и предупреждения',
-    'Бессмысленный запрос'
-]
-
-sub_clusters = {
-    'Общие вопросы о работе с системой': ['Регистрация и вход в систему', 'Настройка личного кабинета',
-                                          'Поиск информации'],
-    'Процессы закупок': ['Прямые закупки', 'Котировочные сессии', 'Закупки по потребностям'],
-    'Работа с контрактами': ['Формирование и подписание контрактов', 'Исполнение контрактов'],
-    'Оферты и коммерческие предложения': ['Создание и редактирование оферт', 'Запросы на коммерческие предложения'],
-    'Документы': ['Добавление и удаление документов', 'Редактирование и обновление документации'],
-    'Работа с категориями продукции': ['Выбор конечной категории продукции', 'Использование справочников'],
-    'Техническая поддержка': ['Решение проблем с системой', 'Вопросы о доступности функций'],
-    'Чаты и обсуждения': ['Использование чатов', 'Обсуждение конкретных закупок и контрактов'],
-    'Финансовые операции': ['Банковские гарантии и финансовые инструменты', 'Логистика и связанные услуги'],
-    'Новости и обновления': ['Информация о новых возможностях портала', 'Новости о тендерах и закупках'],
-    'Регуляторные и юридические вопросы': ['Вопросы, связанные с нормативными документами',
-                                           'Правила участия в закупках'],
-    'Ошибки и предупреждения': ['Вопросы о неправильных действиях', 'Работа с блокировками или жалобами'],
-    'Бессмысленный запрос': []
-}
+# Validates a whole page of ORM messages in one pass of pydantic's core
+message_list_adapter = TypeAdapter(List[MessageSchema])
+
+# Lowercased keyword stems that mark a request to be connected with a human operator
+SUPPORT_KEYWORDS = ("оператор", "поддержк", "консультант", "помощник", "специалист")
+SUPPORT_KEYWORD_MIN_LEN = min(map(len, SUPPORT_KEYWORDS))
+SUPPORT_KEYWORDS_RE = re.compile("|".join(map(re.escape, SUPPORT_KEYWORDS)), re.IGNORECASE)
+
+
+def dispatch_to_ai_service(
+        chat_id: UUID,
+        ai_message_id: UUID,
+        message_content: str,
+        conversation_history: List[Dict[str, Any]],
+        callback_url: str,
+        file_contents: Optional[List[Dict[str, Any]]] = None
+):
+    """
+    Send a message to the AI service and store the returned chat metadata.
+    Runs as a background task (in the threadpool) once the user message has been returned.
+    """
+    # Send message to AI service and get full response with additional meta data
+    ai_response = ai_service.send_to_ai_service(
+        message_content=message_content,
+        conversation_history=conversation_history,
+        callback_url=callback_url,
+        file_contents=file_contents
+    )
+
+    db = SessionLocal()
+    try:
+        if ai_response.get("success"):
+            logger.info(f"Message sent to AI service, updating status to PROCESSING")
+            update_message_status.delay(
+                message_id=str(ai_message_id),
+                status=MessageStatus.PROCESSING
+            )
+
+            # --- No chat title update here, handled by frontend WebSocket context ---
+
+            chat_updates = {}
+
+            # Update clusters: map returned subclusters to general clusters
+            if ai_response.get("cluster"):
+                new_subcategories = ai_response["cluster"]
+                new_general = list({SUB_TO_GENERAL[sub] for sub in new_subcategories if sub in SUB_TO_GENERAL})
+                chat_updates["subcategories"] = new_subcategories
+                chat_updates["categories"] = new_general
+                logger.info(f"Updating chat categories to: {new_general}, subcategories: {new_subcategories}")
+
+            # Store suggestions to be shown in the UI, and for the completion callback in Redis
+            if ai_response.get("suggestions"):
+                chat_updates["suggestions"] = ai_response["suggestions"]
+                logger.info(f"Storing {len(ai_response['suggestions'])} suggestions for chat")
+                anyio.from_thread.run(
+                    save_message_suggestions_to_redis, str(ai_message_id), ai_response["suggestions"]
+                )
+
+            # Persist cluster and suggestion updates in a single transaction
+            if chat_updates:
+                db.query(Chat).filter(Chat.id == chat_id).update(chat_updates, synchronize_session=False)
+                db.commit()
+
+        else:
+            logger.error("Failed to send message to AI service")
+            update_message_status.delay(
+                message_id=str(ai_message_id),
+                status=MessageStatus.FAILED
+            )
+            chat_service.update_ai_message(
+                db=db,
+                message_id=ai_message_id,
+                content="Sorry, I'm having trouble processing your request right now. Please try again later.",
+                status=MessageStatus.FAILED
+            )
+    except Exception as e:
+        logger.error(f"Error storing AI service response for message {ai_message_id}: {str(e)}", exc_info=True)
+    finally:
+        db.close()
 
 
 @router.get("", response_model=ChatList)
@@ -75,7 +136,7 @@ def get_chats(
             limit=limit
         )
 
-        chat_items = [ChatSchema.from_orm(chat) for chat in chats_data["items"]]
+        chat_items = [ChatListItem.model_validate(chat) for chat in chats_data["items"]]
         logger.info(f"Successfully fetched {len(chat_items)} chats")
         return ChatList(
             items=chat_items,
@@ -151,32 +212,33 @@ async def get_messages(
     """
     try:
         logger.info(f"Getting messages for chat {chat.id}")
-        messages_data = chat_service.get_messages(
+        messages_data = await run_in_threadpool(
+            chat_service.get_messages,
             db=db,
             chat_id=chat.id,
             skip=skip,
             limit=limit
         )
 
-        message_items = []
-
-        # Check for in-progress AI messages to add the latest content from Redis
-        for msg in messages_data["items"]:
-            # Create a message schema from the ORM model
-            message_schema = MessageSchema.from_orm(msg)
-
-            # If it's an AI message in progress, try to get content from Redis
-            if msg.message_type == MessageType.AI and msg.status in [MessageStatus.PENDING, MessageStatus.PROCESSING]:
-                try:
-                    # Get the latest content from Redis if available
-                    redis_content = await get_message_content_from_redis(str(msg.id))
-                    if redis_content:
-                        # Update the content with what's in Redis
-                        message_schema.content = redis_content
-                except Exception as e:
-                    logger.warning(f"Error fetching Redis content for in-progress message {msg.id}: {e}")
-
-            message_items.append(message_schema)
+        # Fetch the latest content of in-progress AI messages from Redis in one round-trip
+        pending_ids = [
+            str(msg.id) for msg in messages_data["items"]
+            if msg.message_type == MessageType.AI
+            and msg.status in (MessageStatus.PENDING, MessageStatus.PROCESSING)
+        ]
+        redis_contents = await get_messages_content_from_redis(pending_ids)
+
+        # Validation walks the loaded relationships, so keep it off the event loop
+        message_items = await run_in_threadpool(
+            message_list_adapter.validate_python,
+            messages_data["items"],
+            from_attributes=True
+        )
+        for message_schema in message_items:
+            redis_content = redis_contents.get(str(message_schema.id))
+            if redis_content:
+                # Update the content with what's in Redis
+                message_schema.content = redis_content
 
         logger.info(f"Successfully fetched {len(message_items)} messages")
         return MessageList(
@@ -192,6 +254,7 @@ async def get_messages(
 async def create_message(
         request: Request,
         message_data: MessageCreate,
+        background_tasks: BackgroundTasks,
         chat: Chat = Depends(get_chat_by_id),
         db: Session = Depends(get_db)
 ):
@@ -201,15 +264,16 @@ async def create_message(
     a system message is created and returned instead of processing with AI.
     """
     try:
+        # Commits below expire the chat, so read what is needed from it up front
+        chat_id = chat.id
+        owner_id = chat.user_id
         is_support_request = False
-        support_keywords = ["оператор", "поддержк", "консультант", "помощник", "специалист"]
 
-        # Check if the message content requests support
-        if message_data.content:
-            message_lower = message_data.content.lower()
-            if any(keyword in message_lower for keyword in support_keywords):
-                is_support_request = True
-                logger.info(f"Detected support request: {message_data.content}")
+        # Check if the message content requests support (too-short content can't match any keyword)
+        content = message_data.content
+        if content and len(content) >= SUPPORT_KEYWORD_MIN_LEN and SUPPORT_KEYWORDS_RE.search(content):
+            is_support_request = True
+            logger.info(f"Detected support request: {content}")
 
         # If this is a support request, create ONLY a system message and return it
         if is_support_request:
@@ -217,10 +281,12 @@ async def create_message(
             system_content = "Запрос на соединение с оператором отправлен. Пожалуйста, ожидайте, оператор присоединится к чату в ближайшее время."
 
             # Use the chat service to create the system message
-            system_message = chat_service.create_system_message(
-                db=db,
-                chat_id=chat.id,
-                content=system_content
+            system_message = await run_in_threadpool(
+                lambda: MessageSchema.model_validate(chat_service.create_system_message(
+                    db=db,
+                    chat_id=chat_id,
+                    content=system_content
+                ))
             )
             logger.info(f"Created system message {system_message.id} for support request")
 
@@ -228,33 +294,42 @@ async def create_message(
             return system_message
 
         # --- Normal message processing (not a support request) ---
-        logger.info(f"Creating user message in chat {chat.id}: {message_data.content[:30]}...")
-        user_message = chat_service.create_user_message(
-            db=db,
-            chat_id=chat.id,
-            message_data=message_data
+        logger.info(f"Creating user message in chat {chat_id}: {message_data.content[:30]}...")
+        # Build the response before the next commit expires the message
+        user_message = await run_in_threadpool(
+            lambda: MessageSchema.model_validate(chat_service.create_user_message(
+                db=db,
+                chat_id=chat_id,
+                message_data=message_data
+            ))
         )
         logger.info(f"Created user message {user_message.id}")
 
         # Create the AI message (initially pending)
-        ai_message = chat_service.create_ai_message(
+        ai_message = await run_in_threadpool(
+            chat_service.create_ai_message,
             db=db,
-            chat_id=chat.id
+            chat_id=chat_id
         )
         logger.info(f"Created pending AI message {ai_message.id}")
 
+        # The AI service streams the reply back through callbacks; remember who to broadcast them to
+        chat_service.cache_message_owner_id(chat_id, ai_message.id, owner_id)
+
         # Get conversation history (excluding the AI message we just created)
-        messages = db.query(Message).filter(
-            Message.chat_id == chat.id,
-            Message.id != ai_message.id
-        ).order_by(Message.created_at).all()
+        messages = await run_in_threadpool(
+            lambda: db.query(Message).filter(
+                Message.chat_id == chat_id,
+                Message.id != ai_message.id
+            ).order_by(Message.created_at).all()
+        )
         conversation_history = ai_service.prepare_conversation_history(messages)
 
         # Create callback URL
         host = str(request.base_url).rstrip('/')
         callback_url = ai_service.create_callback_url(
             host=host,
-            chat_id=chat.id,
+            chat_id=chat_id,
             message_id=ai_message.id
         )
         logger.info(f"Callback URL created: {callback_url}")
@@ -262,70 +337,40 @@ async def create_message(
         # Get file contents if any file IDs were provided
         file_contents = None
         if message_data.file_ids and len(message_data.file_ids) > 0:
-            file_contents = []
-            for file_id in message_data.file_ids:
-                file = db.query(File).filter(File.id == file_id).first()
-                if file and file.content:
-                    file_contents.append({
-                        "id": str(file.id),
-                        "name": file.original_name or file.name,
-                        "content": file.content,
-                        "type": file.file_type.value if file.file_type else "OTHER"
-                    })
+            # Load all files with content in one query, then keep the order the IDs were given in
+            files = await run_in_threadpool(
+                lambda: db.query(File).filter(
+                    File.id.in_(message_data.file_ids),
+                    File.content.isnot(None)
+                ).all()
+            )
+            files_by_id = {file.id: file for file in files}
+            file_contents = [
+                {
+                    "id": str(file.id),
+                    "name": file.original_name or file.name,
+                    "content": file.content,
+                    "type": file.file_type.value if file.file_type else "OTHER"
+                }
+                for file in (files_by_id.get(file_id) for file_id in message_data.file_ids)
+                if file and file.content
+            ]
 
             if file_contents:
                 logger.info(f"Including {len(file_contents)} file contents with AI request")
 
-        # Send message to AI service and get full response with additional meta data
-        ai_response = ai_service.send_to_ai_service(
+        # Send message to AI service after the response has been returned; the AI reply
+        # is streamed back through the callback endpoint
+        background_tasks.add_task(
+            dispatch_to_ai_service,
+            chat_id=chat_id,
+            ai_message_id=ai_message.id,
             message_content=message_data.content,
             conversation_history=conversation_history,
             callback_url=callback_url,
             file_contents=file_contents
         )
 
-        if ai_response.get("success"):
-            logger.info(f"Message sent to AI service, updating status to PROCESSING")
-            update_message_status.delay(
-                message_id=str(ai_message.id),
-                status=MessageStatus.PROCESSING
-            )
-
-            # --- No chat title update here, handled by frontend WebSocket context ---
-
-            # Update clusters: map returned subclusters to general clusters
-            if ai_response.get("cluster"):
-                new_subcategories = ai_response["cluster"]
-                new_general = []
-                for sub in new_subcategories:
-                    for general, subs in sub_clusters.items():
-                        if sub in subs:
-                            new_general.append(general)
-                new_general = list(set(new_general))
-                chat.subcategories = new_subcategories
-                chat.categories = new_general
-                db.commit()
-                logger.info(f"Updated chat categories to: {new_general}, subcategories: {new_subcategories}")
-
-            # Store suggestions to be shown in the UI
-            if ai_response.get("suggestions"):
-                chat.suggestions = ai_response["suggestions"]
-                db.commit()
-                logger.info(f"Stored {len(ai_response['suggestions'])} suggestions for chat")
-
-        else:
-            logger.error("Failed to send message to AI service")
-            update_message_status.delay(
-                message_id=str(ai_message.id),
-                status=MessageStatus.FAILED
-            )
-            chat_service.update_ai_message(
-                db=db,
-                message_id=ai_message.id,
-                content="Sorry, I'm having trouble processing your request right now. Please try again later.",
-                status=MessageStatus.FAILED
-            )
-
         # Return the user message that triggered the AI response
         return user_message
 
@@ -350,18 +395,18 @@ async def create_system_message_endpoint( # Renamed to avoid conflict
     Create a new system message in a chat. (Endpoint for external/admin use if needed)
     """
     try:
-        # Verify chat exists and user has access
-        chat = await run_in_threadpool(
-            lambda: db.query(Chat).filter(Chat.id == chat_id).first()
+        # Verify chat exists and user has access (only the owner column is needed)
+        chat_user_id = await run_in_threadpool(
+            lambda: db.query(Chat.user_id).filter(Chat.id == chat_id).scalar()
         )
-        if not chat:
+        if not chat_user_id:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Chat not found"
             )
 
         # Check if user has access to this chat (Only admin or chat owner)
-        if chat.user_id != current_user.id and not current_user.is_admin:
+        if chat_user_id != current_user.id and not current_user.is_admin:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Access forbidden"
@@ -375,10 +420,12 @@ async def create_system_message_endpoint( # Renamed to avoid conflict
             )
 
         # Create system message using the service function
-        system_message = chat_service.create_system_message(
-            db=db,
-            chat_id=chat_id,
-            content=content
+        system_message = await run_in_threadpool(
+            lambda: MessageSchema.model_validate(chat_service.create_system_message(
+                db=db,
+                chat_id=chat_id,
+                content=content
+            ))
         )
 
         logger.info(f"Created system message {system_message.id} in chat {chat_id} via endpoint")
@@ -443,112 +490,93 @@ def add_message_reaction(
 async def message_callback(
         chat_id: UUID,
         message_id: UUID,
-        data: Dict[str, Any] = Body(...),
+        data: CallbackPayload,
         db: Session = Depends(get_db)
 ):
     logger.info(f"Received callback for chat {chat_id}, message {message_id}")
-    logger.debug(f"Callback data: {json.dumps(data, default=str)[:500]}")
-
-    # Check if message exists
-    message = db.query(Message).filter(
-        Message.id == message_id,
-        Message.chat_id == chat_id
-    ).first()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Callback data: %s", data.model_dump_json()[:500])
+
+    # Determine the chat owner (for broadcasting); a cache miss also checks that the message exists in this chat
+    user_id = chat_service.get_cached_message_owner_id(chat_id, message_id)
+    if user_id is None:
+        user_id = await run_in_threadpool(
+            chat_service.load_message_owner_id,
+            db=db,
+            chat_id=chat_id,
+            message_id=message_id
+        )
 
-    if not message:
+    if not user_id:
         logger.error(f"Message {message_id} not found for chat {chat_id}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Message not found"
         )
 
-    # Validate that data contains the expected keys
-    required_keys = ["chunk_id", "content", "is_final"]
-    if not all(key in data for key in required_keys):
-        logger.error("Callback data missing required keys")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid callback format"
-        )
-
-    # Determine user_id for broadcasting
-    chat_obj = db.query(Chat).filter(Chat.id == chat_id).first()
-    user_id = chat_obj.user_id if chat_obj else None
-    if not user_id:
-        logger.error(f"Could not determine user_id for chat {chat_id}")
-        user_id = UUID("00000000-0000-0000-0000-000000000000")  # Fallback
-
-    content = data.get("content", "")
-    is_final = data.get("is_final", False)
-    chat_name = data.get("name") # Get potential chat name update
-    suggestions = data.get("suggestions", []) # Get suggestions
-
-    # Get sources from either context_used or content_used
-    context_used = data.get("context_used", [])
-    content_used = data.get("content_used", [])
+    content = data.content
+    is_final = data.is_final
+    chat_name = data.name # Get potential chat name update
+    suggestions = data.suggestions or [] # Get suggestions
 
     # Use content_used if available, otherwise fall back to context_used
-    sources_data = content_used if content_used and isinstance(content_used, list) else context_used
+    sources_data = data.content_used or data.context_used or []
+
+    # Queue only the new chunk (with metadata) for the client; consecutive chunks are coalesced
+    # into one frame. Include chat_name and suggestions only if they exist in the callback data
+    await queue_message_chunk(
+        chat_id,
+        user_id,
+        message_id,
+        content,
+        **({"chat_name": chat_name} if chat_name else {}),
+        **({"suggestions": suggestions} if suggestions else {})
+    )
 
-    # Append this chunk to Redis
+    # Append this chunk to Redis before acknowledging the callback, so the content is
+    # complete and in order whichever worker receives the final callback
     await save_message_chunk_to_redis(str(message_id), content)
 
-    # Prepare chunk data for broadcasting, including potential name update and suggestions
-    broadcast_chunk_data = {
-        "type": "chunk",
-        "message_id": str(message_id),
-        "content": content,
-        # Include chat_name and suggestions only if they exist in the callback data
-        **({"chat_name": chat_name} if chat_name else {}),
-        **({"suggestions": suggestions} if suggestions else {}),
-    }
+    if is_final:
+        # Retrieve the full accumulated message content,
+        # together with the final suggestions (stored by the create_message dispatch)
+        full_content, stored_suggestions = await asyncio.gather(
+            get_message_content_from_redis(str(message_id)),
+            get_message_suggestions_from_redis(str(message_id))
+        )
 
-    # Send only the new chunk (with metadata) to the client
-    await broadcast_message(chat_id, user_id, broadcast_chunk_data)
+        # Store the final content and sources in the database
+        completed = await run_in_threadpool(
+            chat_service.complete_ai_message,
+            db=db,
+            message_id=message_id,
+            content=full_content,
+            sources=sources_data
+        )
 
+        # No more callbacks are expected for this message
+        chat_service.forget_message_owner_id(chat_id, message_id)
 
-    if is_final:
-        # Retrieve the full accumulated message content
-        full_content = await get_message_content_from_redis(str(message_id))
-
-        # Update the message in the database
-        message.content = full_content
-        message.status = MessageStatus.COMPLETED
-        db.commit()
-        db.refresh(message)
-
-        # Process sources/references if provided
-        if sources_data:
-            # First remove any existing sources
-            db.query(Source).filter(Source.message_id == message_id).delete()
-
-            # Then add the new sources
-            for ref in sources_data:
-                ref_id = ref.get("id")
-                source_name = ref.get("source", "")
-                page = ref.get("page")
-
-                # Only create source if we have both id and source name
-                if ref_id and source_name:
-                    source = Source(
-                        message_id=message_id,
-                        title=source_name,
-                        content=str(page) if page else None,  # Just store the page number
-                        url=str(ref_id)  # Store reference number in the url field
-                    )
-                    db.add(source)
-
-            # Log created sources
-            logger.info(f"Created {len(sources_data)} sources for message {message_id}")
-            db.commit()
-
-        # Get the chat's final suggestions (could be updated by AI)
-        # Fetch chat again to get potentially updated suggestions stored by the create_message endpoint
-        chat_obj = db.query(Chat).filter(Chat.id == chat_id).first()
-        final_suggestions = chat_obj.suggestions if chat_obj else suggestions # Fallback to suggestions from callback
-        logger.info(f"Retrieved {len(final_suggestions) if final_suggestions else 0} final suggestions from chat")
-
-        # Send complete notification to client with final sources and suggestions
+        # The owner cache skipped the existence check, and the message was deleted mid-stream
+        if not completed:
+            logger.error(f"Message {message_id} not found for chat {chat_id}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Message not found"
+            )
+
+        # Redis only holds suggestions the dispatch stored; otherwise use the chat's, as before
+        final_suggestions = stored_suggestions
+        if not final_suggestions:
+            final_suggestions = await run_in_threadpool(
+                lambda: db.query(Chat.suggestions).filter(Chat.id == chat_id).scalar()
+            )
+        final_suggestions = final_suggestions or suggestions # Fallback to suggestions from callback
+        logger.info(f"Retrieved {len(final_suggestions) if final_suggestions else 0} final suggestions for message")
+
+        # Send complete notification to client with final sources and suggestions,
+        # after any chunks still waiting to be sent
+        await flush_message_chunks(chat_id, user_id, message_id)
         await broadcast_message_complete(chat_id, user_id, message_id, sources_data, final_suggestions)
 
     return {"status": "success"}
\ No newline at end of file
@@ -1,7 +1,10 @@
 import logging
 import os
+from functools import lru_cache
+from typing import Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
@@ -9,80 +12,96 @@ from pathlib import Path
 
 from app.db.session import get_db
 from app.db.models import Source
+from app.services.document_service import (
+    DOCUMENT_DISPLAY_NAMES,
+    normalize_document_name,
+    parse_page_number,
+    resolve_reference_path
+)
 
 router = APIRouter(prefix="/documents", tags=["Documents"])
 logger = logging.getLogger(__name__)
 
-# Define the references directory
-REFERENCES_DIR = Path("static/references")
-
-# Mapping for document names to directories
-DOCUMENT_MAPPING = {
-    # Document name variations (lowercase) -> directory name
-    "инструкция_по_работе_с_порталом_для_поставщика": "инструкция_по_работе_с_порталом_для_поставщика",
-    "инструкция по работе с порталом для поставщика": "инструкция_по_работе_с_порталом_для_поставщика",
-    "инструкция_по_работе_с_порталом_для_поставщика.pdf": "инструкция_по_работе_с_порталом_для_поставщика",
-    "инструкция_по_работе_с_порталом_для_заказчика": "инструкция_по_работе_с_порталом_для_заказчика",
-    "инструкция по работе с порталом для заказчика": "инструкция_по_работе_с_порталом_для_заказчика",
-    "инструкция_по_работе_с_порталом_для_заказчика.pdf": "инструкция_по_работе_с_порталом_для_заказчика",
-    "инструкция_по_электронному_актированию": "инструкция_по_электронному_актированию",
-    "инструкция по электронному актированию": "инструкция_по_электронному_актированию",
-    "инструкция_по_электронному_актированию.pdf": "инструкция_по_электронному_актированию",
-    "регламент_информационного_взаимодействия": "регламент_информационного_взаимодействия",
-    "регламент информационного взаимодействия": "регламент_информационного_взаимодействия",
-    "регламент_информационного_взаимодействия.pdf": "регламент_информационного_взаимодействия",
-    "xlsx": "xlsx",
-}
-
-# Display names for documents
-DOCUMENT_DISPLAY_NAMES = {
-    "инструкция_по_работе_с_порталом_для_поставщика": "Инструкция по работе с порталом для поставщика",
-    "инструкция_по_работе_с_порталом_для_заказчика": "Инструкция по работе с порталом для заказчика",
-    "инструкция_по_электронному_актированию": "Инструкция по электронному актированию",
-    "регламент_информационного_взаимодействия": "Регламент информационного взаимодействия",
-    "xlsx": "Файл Excel"
-}
-
-
-def normalize_document_name(source_name: str) -> str:
+# Cache-Control for reference files that exist on disk
+REFERENCE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Placeholder image shown for missing reference files: size, fonts, header and the
+# static processing message are prepared once, each placeholder only draws its own
+# details on a copy
+PLACEHOLDER_WIDTH, PLACEHOLDER_HEIGHT = 800, 300
+
+# Try to get a font, use default if not available
+try:
+    PLACEHOLDER_TITLE_FONT = ImageFont.truetype("Arial", 24)
+    PLACEHOLDER_BODY_FONT = ImageFont.truetype("Arial", 16)
+except:
+    PLACEHOLDER_TITLE_FONT = ImageFont.load_default()
+    PLACEHOLDER_BODY_FONT = ImageFont.load_default()
+
+PLACEHOLDER_BASE = Image.new('RGB', (PLACEHOLDER_WIDTH, PLACEHOLDER_HEIGHT), color=(255, 255, 255))
+_placeholder_draw = ImageDraw.Draw(PLACEHOLDER_BASE)
+# Draw header
+_placeholder_draw.rectangle([(0, 0), (PLACEHOLDER_WIDTH, 60)], fill=(47, 90, 168))
+# Add processing message
+_placeholder_draw.text((20, 200), "Документ еще обрабатывается. Пожалуйста, повторите попытку позже.",
+                       font=PLACEHOLDER_BODY_FONT, fill=(0, 0, 0))
+del _placeholder_draw
+
+
+@lru_cache(maxsize=256)
+def build_placeholder_png(
+        ref_url: str,
+        image_path: str,
+        display_name: str,
+        page_number: Optional[str],
+        document_dir: str,
+        source_title: str
+) -> bytes:
     """
-    Normalize a document name from the AI response to match our directory structure.
+    Render the PNG placeholder for a missing reference file.
     """
-    if not source_name:
-        return ""
+    image = PLACEHOLDER_BASE.copy()
+    draw = ImageDraw.Draw(image)
 
-    # Convert to lowercase for case-insensitive matching
-    name_lower = source_name.lower().strip()
+    draw.text((20, 15), f"Ссылка [{ref_url}]", font=PLACEHOLDER_TITLE_FONT, fill=(255, 255, 255))
 
-    # Remove any "таблица из файла" prefix
-    if "таблица из файла" in name_lower:
-        name_lower = name_lower.replace("таблица из файла", "").strip()
+    # Draw error message
+    draw.text((20, 80), f"Файл не найден: {image_path}", font=PLACEHOLDER_BODY_FONT, fill=(255, 0, 0))
 
-    # Try direct mapping
-    if name_lower in DOCUMENT_MAPPING:
-        return DOCUMENT_MAPPING[name_lower]
+    # Draw document information
+    draw.text((20, 120), f"Документ: {display_name}", font=PLACEHOLDER_BODY_FONT, fill=(0, 0, 0))
+    if page_number:
+        draw.text((20, 150), f"Страница: {page_number}", font=PLACEHOLDER_BODY_FONT, fill=(0, 0, 0))
 
-    # Try partial matching if no exact match
-    for key, value in DOCUMENT_MAPPING.items():
-        if key in name_lower:
-            return value
+    # Add debug information
+    draw.text((20, 230), f"Нормализованный путь: {document_dir}", font=PLACEHOLDER_BODY_FONT, fill=(100, 100, 100))
+    draw.text((20, 260), f"Исходное название: {source_title}", font=PLACEHOLDER_BODY_FONT, fill=(100, 100, 100))
 
-    # Return as is if no match found
-    return name_lower
+    # Convert image to bytes
+    img_byte_arr = BytesIO()
+    # Fast deflate - the placeholder is small and served from memory, max compression would be wasted CPU
+    image.save(img_byte_arr, format='PNG', compress_level=1)
+
+    return img_byte_arr.getvalue()
 
 
 @router.get("/reference/{message_id}/{ref_num}")
-async def get_reference_image(
+def get_reference_image(
+        request: Request,
         message_id: UUID,
         ref_num: str,
         db: Session = Depends(get_db)
 ):
     """
     Get a reference image for a document reference in a message.
+    Declared sync so the database lookup, file checks and placeholder
+    rendering run in the threadpool rather than on the event loop.
     """
     try:
-        # Find the source reference
-        source = db.query(Source).filter(
+        # Find the source reference, reading only the columns used (covered by ix_source_message_id_url)
+        source = db.query(
+            Source.title, Source.content, Source.document_dir, Source.resolved_path
+        ).filter(
             Source.message_id == message_id,
             Source.url == ref_num
         ).first()
@@ -96,93 +115,49 @@ async def get_reference_image(
 
         # Parse the document information from the source
         source_title = source.title if source.title else ""
-        page_number = None
-
-        # Extract page number from content (expect format like "Page 9" or just the number)
-        if source.content:
-            if source.content.startswith("Page "):
-                page_number = source.content.replace("Page ", "")
-            else:
-                page_number = source.content
+        page_number = parse_page_number(source.content)
 
-        # Normalize the document name to match our directory structure
-        document_dir = normalize_document_name(source_title)
+        # Document directory and file are resolved when the source is stored; older
+        # sources and documents that weren't available yet are resolved here
+        document_dir = source.document_dir or normalize_document_name(source_title)
 
         # Get display name for the document
         display_name = DOCUMENT_DISPLAY_NAMES.get(document_dir, source_title)
 
-        # Determine file path based on whether it's a page in a directory
-        logger.info(f"Looking for document: {document_dir}, page: {page_number}")
-
-        if page_number and page_number.isdigit():
-            # It's a page in a directory
-            image_path = REFERENCES_DIR / document_dir / f"{page_number}.png"
-            logger.info(f"Trying to access image at: {image_path}")
+        if source.resolved_path:
+            image_path = Path(source.resolved_path)
         else:
-            # Assume it's a direct file reference
-            image_path = REFERENCES_DIR / f"{document_dir}.png"
-
-            # If the direct file doesn't exist, check for other formats
-            if not image_path.exists():
-                for ext in ['.pdf', '.xlsx', '.docx', '.jpg', '.jpeg']:
-                    alt_path = REFERENCES_DIR / f"{document_dir}{ext}"
-                    if alt_path.exists():
-                        image_path = alt_path
-                        break
+            logger.info(f"Looking for document: {document_dir}, page: {page_number}")
+            image_path = resolve_reference_path(document_dir, page_number)
 
         # Check if the file exists
         if image_path.exists():
-            # For image files, return directly
-            with open(image_path, "rb") as f:
-                image_data = f.read()
-                return Response(
-                    content=image_data,
-                    media_type="image/png" if str(image_path).endswith('.png') else "application/octet-stream"
-                )
+            # Reference files never change once written, so let clients cache them and
+            # revalidate with the ETag instead of downloading them again
+            stat_result = image_path.stat()
+            etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+            headers = {"Cache-Control": REFERENCE_CACHE_CONTROL, "ETag": etag}
+
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            # For image files, let the server send the file directly
+            return FileResponse(
+                path=image_path,
+                media_type="image/png" if str(image_path).endswith('.png') else "application/octet-stream",
+                headers=headers,
+                stat_result=stat_result
+            )
         else:
-            # If file doesn't exist, create a placeholder image with error message
+            # If file doesn't exist, return a placeholder image with error message
             logger.warning(f"Reference file not found: {image_path}")
 
-            # Create a placeholder image
-            width, height = 800, 300
-            image = Image.new('RGB', (width, height), color=(255, 255, 255))
-            draw = ImageDraw.Draw(image)
-
-            # Draw header
-            draw.rectangle([(0, 0), (width, 60)], fill=(47, 90, 168))
-
-            # Try to get a font, use default if not available
-            try:
-                title_font = ImageFont.truetype("Arial", 24)
-                body_font = ImageFont.truetype("Arial", 16)
-            except:
-                title_font = ImageFont.load_default()
-                body_font = ImageFont.load_default()
-
-            draw.text((20, 15), f"Ссылка [{source.url}]", font=title_font, fill=(255, 255, 255))
-
-            # Draw error message
-            draw.text((20, 80), f"Файл не найден: {image_path}", font=body_font, fill=(255, 0, 0))
-
-            # Draw document information
-            draw.text((20, 120), f"Документ: {display_name}", font=body_font, fill=(0, 0, 0))
-            if page_number:
-                draw.text((20, 150), f"Страница: {page_number}", font=body_font, fill=(0, 0, 0))
-
-            # Add processing message
-            draw.text((20, 200), "Документ еще обрабатывается. Пожалуйста, повторите попытку позже.",
-                      font=body_font, fill=(0, 0, 0))
-
-            # Add debug information
-            draw.text((20, 230), f"Нормализованный путь: {document_dir}", font=body_font, fill=(100, 100, 100))
-            draw.text((20, 260), f"Исходное название: {source_title}", font=body_font, fill=(100, 100, 100))
-
-            # Convert image to bytes
-            img_byte_arr = BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_byte_arr.seek(0)
-
-            return Response(content=img_byte_arr.getvalue(), media_type="image/png")
+            return Response(
+                content=build_placeholder_png(
+                    ref_num, str(image_path), display_name, page_number, document_dir, source_title
+                ),
+                media_type="image/png"
+            )
 
     except HTTPException:
         raise
@@ -1,9 +1,12 @@
+import asyncio
 from typing import List
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response
+from celery import group
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
 from app.core.dependencies import get_current_active_user
@@ -45,18 +48,14 @@ async def upload_file(
     Upload a file.
     """
     # Check file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
-
-    if file_size > settings.MAX_UPLOAD_SIZE:
+    if file_service.get_upload_size(file) > settings.MAX_UPLOAD_SIZE:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"File too large. Maximum size is {settings.MAX_UPLOAD_SIZE} bytes"
         )
 
     # Save file
-    file_data = file_service.save_upload_file(file, settings.UPLOAD_PATH)
+    file_data = await run_in_threadpool(file_service.save_upload_file, file, settings.UPLOAD_PATH)
 
     # Create file record in DB
     file_record = file_service.create_file(db, current_user, file_data)
@@ -90,42 +89,42 @@ async def upload_multiple_files(
     """
     Upload multiple files.
     """
-    responses = []
-
-    for file in files:
-        # Check file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
-
-        if file_size > settings.MAX_UPLOAD_SIZE:
-            # Skip files that are too large
-            continue
-
-        # Save file
-        file_data = file_service.save_upload_file(file, settings.UPLOAD_PATH)
-
-        # Create file record in DB
-        file_record = file_service.create_file(db, current_user, file_data)
-
-        # Process file asynchronously
-        process_file.delay(str(file_record.id))
-
-        # Add preview URL
-        preview_url = file_service.get_file_preview_url(file_record.id)
-
-        # Create response
-        response = {
-            "id": file_record.id,
-            "name": file_record.name,
-            "original_name": file_record.original_name,
-            "file_type": file_record.file_type,
-            "mime_type": file_record.mime_type,
-            "size": file_record.size,
-            "preview_url": preview_url
-        }
-
-        responses.append(response)
+    # Skip files that are too large, save the rest to disk in parallel
+    files = [file for file in files if file_service.get_upload_size(file) <= settings.MAX_UPLOAD_SIZE]
+    saved_files = await asyncio.gather(*(
+        run_in_threadpool(file_service.save_upload_file, file, settings.UPLOAD_PATH)
+        for file in files
+    ))
+
+    def create_file_records():
+        # Create all file records in a single transaction
+        file_records = [
+            file_service.create_file(db, current_user, file_data, commit=False)
+            for file_data in saved_files
+        ]
+
+        # Build responses before committing, which would expire the loaded attributes
+        responses = [
+            {
+                "id": file_record.id,
+                "name": file_record.name,
+                "original_name": file_record.original_name,
+                "file_type": file_record.file_type,
+                "mime_type": file_record.mime_type,
+                "size": file_record.size,
+                "preview_url": file_service.get_file_preview_url(file_record.id)
+            }
+            for file_record in file_records
+        ]
+
+        db.commit()
+        return responses
+
+    responses = await run_in_threadpool(create_file_records)
+
+    # Process files asynchronously, publishing all tasks in one batch
+    if responses:
+        group(process_file.s(str(response["id"])) for response in responses).apply_async()
 
     return responses
 
@@ -154,17 +153,11 @@ def get_file(
             detail="Access forbidden"
         )
 
-    # Add preview URL
-    preview_url = file_service.get_file_preview_url(file.id)
-
-    # Convert to schema
-    file_schema = FileSchema.from_orm(file)
-
-    # Manually add preview URL (not in DB model)
-    file_dict = file_schema.dict()
-    file_dict["preview_url"] = preview_url
+    # Convert to schema and add the preview URL (not in DB model)
+    file_schema = FileSchema.model_validate(file)
+    file_schema.preview_url = file_service.get_file_preview_url(file.id)
 
-    return FileSchema(**file_dict)
+    return file_schema
 
 
 @router.get("/{file_id}/download")
@@ -183,10 +176,18 @@ def download_file(
             detail="File not found"
         )
 
+    stat_result = file_service.get_file_stat_result(file)
+    if stat_result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
     return FileResponse(
         path=file.path,
         filename=file.original_name,
-        media_type=file.mime_type
+        media_type=file.mime_type,
+        stat_result=stat_result
     )
 
 
@@ -198,7 +199,13 @@ def get_file_preview(
     """
     Get file preview image. Public route - no authentication required.
     """
-    file = file_service.get_file(db, file_id)
+    # Serve the on-disk copy if the preview has already been written out. The database
+    # row stays the source of truth, so a copy left behind by a removed preview isn't served
+    preview_path = file_service.get_preview_cache_path(file_id)
+    if preview_path.exists() and file_service.has_file_preview(db, file_id):
+        return FileResponse(path=preview_path, media_type="image/jpeg")
+
+    file = file_service.get_file(db, file_id, with_preview=True)
 
     if not file:
         raise HTTPException(
@@ -213,7 +220,7 @@ def get_file_preview(
             detail="Preview not available"
         )
 
-    return Response(
-        content=file.preview.data,
-        media_type="image/jpeg"
-    )
\ No newline at end of file
+    # Write the preview out once, later requests skip the database
+    preview_path = file_service.write_preview_cache(file_id, file.preview.data)
+
+    return FileResponse(path=preview_path, media_type="image/jpeg")
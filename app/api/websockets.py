@@ -1,18 +1,21 @@
 import asyncio
-import json
 import logging
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
 from uuid import UUID
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status, Depends, Query
+import orjson
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
 from sqlalchemy.orm import Session
 from starlette.concurrency import run_in_threadpool
+from redis.asyncio import Redis
 from starlette.websockets import WebSocketState
 
+from app.core.config import settings
 from app.core.security import validate_token
 from app.db.session import get_db
 from app.db.models import User, Chat
-from app.tasks.message_tasks import get_message_content_from_redis
+from app.tasks.message_tasks import get_message_content_from_redis, get_messages_content_from_redis, \
+    get_redis
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -21,77 +24,284 @@ router = APIRouter(tags=["WebSockets"])
 
 # Active WebSocket connections - structure:
 # {
-#   "chat_id:user_id": {
-#     "connections": [WebSocket],
-#     "last_activity": timestamp
+#   (chat_id, user_id): {WebSocket: asyncio.Queue}
+# }
+active_connections: Dict[Tuple[UUID, UUID], Dict[WebSocket, asyncio.Queue]] = {}
+
+# Last connect or client message per connection key, in event loop time
+last_activity: Dict[Tuple[UUID, UUID], float] = {}
+
+# Connection keys each WebSocket is registered under - structure:
+# {
+#   WebSocket: {(chat_id, user_id)}
+# }
+connection_keys: Dict[WebSocket, Set[Tuple[UUID, UUID]]] = {}
+
+# Streamed chunks waiting to be sent as a single frame - structure:
+# {
+#   (chat_id, user_id, message_id): {
+#     "parts": [str],
+#     "extra": {"chat_name": ..., "suggestions": ...},
+#     "task": asyncio.Task
 #   }
 # }
-active_connections: Dict[str, Dict[str, Any]] = {}
+pending_chunks: Dict[Tuple[UUID, UUID, UUID], Dict[str, Any]] = {}
 
-# Keep track of connection IDs to prevent double-close errors
-connection_ids: Set[int] = set()
+# How long streamed chunks are collected before being broadcast together
+CHUNK_FLUSH_INTERVAL = settings.WS_CHUNK_FLUSH_INTERVAL
 
+# Chat access decisions for WebSocket connects - structure:
+# {
+#   (chat_id, user_id): (expires_at, allowed)
+# }
+chat_access_cache: Dict[Tuple[UUID, str], Tuple[float, bool]] = {}
 
-async def get_token_data(
-        token: str = Query(...),
-) -> Dict[str, Any]:
-    """
-    Validate token and get user data.
-    """
-    token_data = validate_token(token)
-    if not token_data:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-    return token_data
+# How long a chat access decision is reused for reconnects. This is also how long a
+# connect can still be allowed after a chat is deleted or changes owner, unless the
+# code doing that awaits forget_chat_access
+CHAT_ACCESS_CACHE_TTL = 30.0  # 30 seconds
+
+# Entries kept before expired access decisions are purged
+CHAT_ACCESS_CACHE_MAX_SIZE = 10000
+
+# How long access granted to a chat is shared between workers through Redis, kept
+# to the in-process window so a revoked grant lingers no longer than a cached one
+CHAT_ACCESS_REDIS_TTL = 30  # 30 seconds
+
+# Redis channel every worker listens on for broadcasts when WS_REDIS_BROADCAST is enabled
+BROADCAST_CHANNEL = "ws:broadcast"
+
+# Seconds to wait before resubscribing after the broadcast listener loses Redis
+BROADCAST_RESUBSCRIBE_DELAY = 1.0
+
+# This worker's broadcast bus Redis client and listener task
+broadcast_redis: Optional[Redis] = None
+broadcast_listener_task: Optional[asyncio.Task] = None
+
+# Starlette's connected state, compared by identity
+CONNECTED = WebSocketState.CONNECTED
+
+# Error replies that never change, serialized once
+INVALID_JSON_FRAME = orjson.dumps({"error": "Invalid JSON format"}).decode()
+MISSING_MESSAGE_ID_FRAME = orjson.dumps({"error": "Missing message_id"}).decode()
+INVALID_CHAT_ID_FRAME = orjson.dumps({"error": "Invalid chat_id"}).decode()
+
+# Frames queued for a connection before it is considered too slow and disconnected
+SEND_QUEUE_SIZE = 256
+
+# Queued in place of pending frames to make a slow connection's writer close it
+CLOSE_SLOW_CLIENT = object()
+
+# Largest frame the connection writer builds by merging queued chunk frames
+MAX_MERGED_FRAME_SIZE = 16 * 1024  # 16 KB
 
 
 def is_websocket_connected(websocket: WebSocket) -> bool:
     """Check if a WebSocket is still connected."""
+    return websocket.client_state is CONNECTED
+
+
+def get_chat_and_user(db: Session, chat_id: UUID, user_id: str) -> Tuple[Optional[Chat], Optional[User]]:
+    """Load the chat and the connecting user. Blocking, run it in the threadpool."""
+    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    user = db.query(User).filter(User.id == user_id).first()
+    return chat, user
+
+
+def check_chat_access(db: Session, chat_id: UUID, user_id: str) -> Tuple[bool, List[str]]:
+    """
+    Check whether the user may connect to the chat and return the chat suggestions.
+    Blocking, run it in the threadpool.
+    """
+    chat, user = get_chat_and_user(db, chat_id, user_id)
+    if not chat:
+        logger.warning(f"Chat {chat_id} not found for WebSocket connection")
+        return False, []
+    if not user or (chat.user_id != UUID(user_id) and not user.is_admin):
+        logger.warning(f"User {user_id} does not have access to chat {chat_id}")
+        return False, []
+    return True, list(chat.suggestions or [])
+
+
+def get_chat_suggestions(db: Session, chat_id: UUID) -> List[str]:
+    """Load the current suggestions of a chat. Blocking, run it in the threadpool."""
+    suggestions = db.query(Chat.suggestions).filter(Chat.id == chat_id).scalar()
+    return list(suggestions or [])
+
+
+async def has_shared_chat_access(chat_id: UUID, user_id: str) -> bool:
+    """Check whether any worker granted access to the chat. Denials are never stored."""
     try:
-        return websocket.client_state == WebSocketState.CONNECTED
-    except Exception:
+        return await get_redis().exists(f"ws:access:{chat_id}:{user_id}") > 0
+    except Exception as e:
+        logger.error(f"Error getting chat access from Redis: {str(e)}")
         return False
 
 
-async def safe_send_json(websocket: WebSocket, data: dict) -> bool:
-    """Safely send JSON data over a WebSocket with error handling."""
-    if not is_websocket_connected(websocket):
-        return False
+async def save_shared_chat_access(chat_id: UUID, user_id: str):
+    """Store a marker for access granted to the chat in Redis for every worker to reuse."""
+    try:
+        await get_redis().set(f"ws:access:{chat_id}:{user_id}", "1", ex=CHAT_ACCESS_REDIS_TTL)
+    except Exception as e:
+        logger.error(f"Error saving chat access to Redis: {str(e)}")
+
+
+async def get_chat_access(db: Session, chat_id: UUID, user_id: str, now: float) -> Tuple[bool, List[str]]:
+    """
+    Return the cached chat access decision and the chat's current suggestions.
+    On a miss the access granted by any worker is read from Redis before
+    falling back to the database.
+    """
+    cache_key = (chat_id, user_id)
+    cached = chat_access_cache.get(cache_key)
+    if cached and cached[0] > now:
+        if not cached[1]:
+            return False, []
+        # Suggestions are rewritten after every AI reply, so only the decision is cached
+        return True, await run_in_threadpool(get_chat_suggestions, db, chat_id)
+
+    if await has_shared_chat_access(chat_id, user_id):
+        allowed = True
+        suggestions = await run_in_threadpool(get_chat_suggestions, db, chat_id)
+    else:
+        allowed, suggestions = await run_in_threadpool(check_chat_access, db, chat_id, user_id)
+        if allowed:
+            await save_shared_chat_access(chat_id, user_id)
+
+    if len(chat_access_cache) >= CHAT_ACCESS_CACHE_MAX_SIZE:
+        for key in [key for key, entry in chat_access_cache.items() if entry[0] <= now]:
+            del chat_access_cache[key]
+    chat_access_cache[cache_key] = (now + CHAT_ACCESS_CACHE_TTL, allowed)
+    return allowed, suggestions
+
+
+async def forget_chat_access(chat_id: UUID, user_id: Optional[str] = None):
+    """Drop cached access decisions for a chat, for one user or all of them.
+
+    Call it wherever a chat is deleted or its owner changes, so reconnects are
+    checked against the database again instead of reusing a stale decision.
+    The shared Redis grants are deleted too; other workers' in-process
+    decisions still expire within CHAT_ACCESS_CACHE_TTL.
+    """
+    if user_id is not None:
+        chat_access_cache.pop((chat_id, user_id), None)
+    else:
+        for key in [key for key in chat_access_cache if key[0] == chat_id]:
+            del chat_access_cache[key]
 
     try:
-        await websocket.send_json(data)
-        return True
+        redis = get_redis()
+        if user_id is not None:
+            await redis.delete(f"ws:access:{chat_id}:{user_id}")
+        else:
+            keys = [key async for key in redis.scan_iter(match=f"ws:access:{chat_id}:*")]
+            if keys:
+                await redis.delete(*keys)
     except Exception as e:
-        logger.error(f"Error sending JSON over WebSocket: {str(e)}")
-        return False
+        logger.error(f"Error deleting chat access from Redis: {str(e)}")
 
 
-async def safe_close_websocket(websocket: WebSocket, code: int = 1000, reason: str = "") -> bool:
-    """Safely close a WebSocket with error handling."""
-    # Get unique ID for this websocket
-    ws_id = id(websocket)
+def enqueue_frame(queue: asyncio.Queue, payload: str, merge_prefix: Optional[str] = None) -> bool:
+    """Put a serialized frame on a connection's send queue.
 
-    # Check if already closed
-    if ws_id in connection_ids:
-        logger.debug(f"WebSocket {ws_id} already closed")
+    When the client has fallen SEND_QUEUE_SIZE frames behind, its backlog is
+    replaced by a request for the writer task to close it and False is
+    returned; the caller is responsible for unregistering the connection.
+    """
+    try:
+        queue.put_nowait((merge_prefix, payload))
+        return True
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(CLOSE_SLOW_CLIENT)
         return False
 
-    if not is_websocket_connected(websocket):
-        connection_ids.add(ws_id)
+
+def queue_frame(
+        websocket: WebSocket,
+        queue: asyncio.Queue,
+        payload: str,
+        merge_prefix: Optional[str] = None
+) -> bool:
+    """Queue a serialized frame for a connection's writer task.
+
+    A client that has fallen SEND_QUEUE_SIZE frames behind is disconnected
+    rather than letting its backlog grow without bound: it stops receiving
+    broadcasts right away and its writer task closes it.
+    """
+    if enqueue_frame(queue, payload, merge_prefix):
+        return True
+    logger.warning(f"Send queue full for WebSocket {id(websocket)}, closing slow connection")
+    unregister_websocket(websocket)
+    return False
+
+
+def queue_json(websocket: WebSocket, queue: asyncio.Queue, data: Dict[str, Any]) -> bool:
+    """Queue JSON data to be sent over a WebSocket by its writer task."""
+    return queue_frame(websocket, queue, orjson.dumps(data).decode())
+
+
+async def safe_close_websocket(websocket: WebSocket, code: int = 1000, reason: str = "") -> bool:
+    """Safely close a WebSocket with error handling.
+
+    Works both before the handshake is accepted (rejecting it) and after.
+    """
+    # Check if already closed by either side
+    if (websocket.application_state == WebSocketState.DISCONNECTED
+            or websocket.client_state == WebSocketState.DISCONNECTED):
+        logger.debug(f"WebSocket {id(websocket)} already closed")
         return False
 
     try:
         await websocket.close(code=code, reason=reason)
-        connection_ids.add(ws_id)
         return True
     except Exception as e:
         logger.error(f"Error closing WebSocket: {str(e)}")
-        connection_ids.add(ws_id)
         return False
 
 
+def register_connection(
+        connection_key: Tuple[UUID, UUID],
+        websocket: WebSocket,
+        queue: asyncio.Queue,
+        now: float
+):
+    """Start delivering broadcasts for the key to a connection's send queue."""
+    active_connections.setdefault(connection_key, {})[websocket] = queue
+    connection_keys.setdefault(websocket, set()).add(connection_key)
+    last_activity[connection_key] = now
+
+
+def unregister_connection(connection_key: Tuple[UUID, UUID], websocket: WebSocket):
+    """Stop delivering broadcasts for the key to a connection."""
+    keys = connection_keys.get(websocket)
+    if keys is not None:
+        keys.discard(connection_key)
+        if not keys:
+            del connection_keys[websocket]
+
+    connections = active_connections.get(connection_key)
+    if connections is None:
+        return
+
+    try:
+        connections.pop(websocket, None)
+
+        # Remove the connection entry if no more active connections
+        if not connections:
+            del active_connections[connection_key]
+            last_activity.pop(connection_key, None)
+    except Exception as e:
+        logger.error(f"Error cleaning up connection: {str(e)}")
+
+
+def unregister_websocket(websocket: WebSocket):
+    """Stop delivering broadcasts to a connection under every key it is registered under."""
+    for connection_key in list(connection_keys.get(websocket, ())):
+        unregister_connection(connection_key, websocket)
+
+
 @router.websocket("/ws/chat/{chat_id}")
 async def websocket_endpoint(
         websocket: WebSocket,
@@ -100,15 +310,11 @@ async def websocket_endpoint(
         db: Session = Depends(get_db)
 ):
     """WebSocket endpoint for chat messages."""
-    ws_id = id(websocket)
     user_connection_id = None
     connection_key = None
     socket_already_closed = False
     is_new_chat = websocket.query_params.get("new_chat") == "true"
-
-    # Clear any existing closed connection record
-    if ws_id in connection_ids:
-        connection_ids.remove(ws_id)
+    loop_time = asyncio.get_running_loop().time
 
     try:
         # Validate token
@@ -127,26 +333,15 @@ async def websocket_endpoint(
             socket_already_closed = True
             return
 
-        # Create a unique connection identifier for this user+chat
-        connection_key = f"{chat_id}:{user_id}"
-
-        # Check if chat exists and user has access
-        chat = await run_in_threadpool(
-            lambda: db.query(Chat).filter(Chat.id == chat_id).first()
-        )
-        if not chat:
-            logger.warning(f"Chat {chat_id} not found for WebSocket connection")
+        # Check if chat exists and user has access, reusing recent decisions for reconnects
+        allowed, suggestions = await get_chat_access(db, chat_id, user_id, loop_time())
+        if not allowed:
             await safe_close_websocket(websocket, code=1008)
             socket_already_closed = True
             return
 
-        # Check if user has access to this chat
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user or (chat.user_id != UUID(user_id) and not user.is_admin):
-            logger.warning(f"User {user_id} does not have access to chat {chat_id}")
-            await safe_close_websocket(websocket, code=1008)
-            socket_already_closed = True
-            return
+        # Create a unique connection identifier for this user+chat
+        connection_key = (chat_id, UUID(user_id))
 
         # Accept connection - MUST BE DONE BEFORE ANY receive_text() CALLS
         try:
@@ -158,126 +353,59 @@ async def websocket_endpoint(
             return
 
         # Register connection AFTER accepting the websocket
-        if connection_key not in active_connections:
-            active_connections[connection_key] = {
-                "connections": [],
-                "last_activity": asyncio.get_event_loop().time()
-            }
+        connected_at = loop_time()
 
-        # Check if this websocket is already in the connections list
-        if websocket not in active_connections[connection_key]["connections"]:
-            active_connections[connection_key]["connections"].append(websocket)
-            active_connections[connection_key]["last_activity"] = asyncio.get_event_loop().time()
+        # Broadcasts are queued for this connection and sent by its own writer task
+        send_queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        register_connection(connection_key, websocket, send_queue, connected_at)
+        writer_task = asyncio.create_task(connection_writer(websocket, send_queue))
 
         # Send welcome message for connection confirmation
         try:
             initMessage = {
                 "type": "connection_established",
                 "chat_id": str(chat_id),
-                "timestamp": str(asyncio.get_event_loop().time())
+                "timestamp": str(connected_at)
             }
 
             # If this is a new chat, include initial suggestions
-            if is_new_chat and chat.suggestions:
-                initMessage["suggestions"] = chat.suggestions
-                logger.info(f"Sending initial suggestions for new chat: {chat.suggestions}")
+            if is_new_chat and suggestions:
+                initMessage["suggestions"] = suggestions
+                logger.info(f"Sending initial suggestions for new chat: {suggestions}")
 
-            await safe_send_json(websocket, initMessage)
+            queue_json(websocket, send_queue, initMessage)
         except Exception as e:
             logger.error(f"Error sending welcome message: {str(e)}")
             # Continue even if welcome message fails
 
         # Main connection loop
         try:
-            # Periodically ping the client to keep the connection alive
-            ping_task = asyncio.create_task(
-                ping_client(websocket, connection_key)
-            )
-
-            # Use a larger timeout to avoid frequent reconnections
-            receive_timeout = 120  # 2 minutes
-
-            while is_websocket_connected(websocket):
-                # Process incoming messages with timeout
+            # receive_text() raises WebSocketDisconnect once the client is gone
+            while True:
+                # Process incoming messages; idle connections are kept alive by protocol-level pings
                 try:
                     # IMPORTANT: Only call receive_text() after websocket.accept()
-                    data = await asyncio.wait_for(websocket.receive_text(), timeout=receive_timeout)
+                    data = await websocket.receive_text()
 
-                    # Update activity timestamp
-                    if connection_key in active_connections:
-                        active_connections[connection_key]["last_activity"] = asyncio.get_event_loop().time()
+                    # Update activity timestamp, unless the connection was dropped as too slow
+                    if connection_key in last_activity:
+                        last_activity[connection_key] = loop_time()
 
                     # Parse message
                     try:
-                        message_data = json.loads(data)
-                    except json.JSONDecodeError:
+                        message_data = orjson.loads(data)
+                    except orjson.JSONDecodeError:
                         logger.warning(f"Invalid JSON format received from user {user_id}")
-                        await safe_send_json(websocket, {
-                            "error": "Invalid JSON format"
-                        })
+                        queue_frame(websocket, send_queue, INVALID_JSON_FRAME)
                         continue
 
                     # Handle message types
-                    message_type = message_data.get("type")
-
-                    if message_type == "ping":
-                        # Respond to ping
-                        await safe_send_json(websocket, {
-                            "type": "pong",
-                            "timestamp": message_data.get("timestamp")
-                        })
-
-                    elif message_type == "stream_request":
-                        # Handle stream request
-                        message_id = message_data.get("message_id")
-
-                        if not message_id:
-                            logger.warning(f"Missing message_id in stream_request from user {user_id}")
-                            await safe_send_json(websocket, {
-                                "error": "Missing message_id"
-                            })
-                            continue
-
-                        logger.info(f"Stream request for message {message_id} from user {user_id}")
-
-                        # Get message content from Redis
-                        content = await get_message_content_from_redis(message_id)
-
-                        # Send content
-                        await safe_send_json(websocket, {
-                            "type": "stream_content",
-                            "message_id": message_id,
-                            "content": content
-                        })
-
-                    elif message_type == "get_suggestions":
-                        # Client is requesting suggestions for this chat
-                        if chat.suggestions:
-                            await safe_send_json(websocket, {
-                                "type": "suggestions",
-                                "suggestions": chat.suggestions
-                            })
-                        else:
-                            await safe_send_json(websocket, {
-                                "type": "suggestions",
-                                "suggestions": []
-                            })
+                    handler = MESSAGE_HANDLERS.get(message_data.get("type"), handle_unknown_message)
+                    await handler(websocket, send_queue, message_data, user_id, suggestions)
 
-                    else:
-                        # Unknown message type
-                        logger.warning(f"Unknown message type '{message_type}' from user {user_id}")
-                        await safe_send_json(websocket, {
-                            "error": f"Unknown message type: {message_type}"
-                        })
-
-                except asyncio.TimeoutError:
-                    # Handle timeout gracefully - just continue waiting
-                    # This timeout is just to allow periodic checks, not an error
-                    logger.debug(f"No message received from client after {receive_timeout}s - continuing")
-                    continue
                 except WebSocketDisconnect:
                     # Handle normal disconnect
-                    logger.info(f"WebSocket disconnected: {connection_key}")
+                    logger.info(f"WebSocket disconnected for chat {chat_id}, user {user_id}")
                     socket_already_closed = True
                     break
                 except Exception as e:
@@ -285,26 +413,111 @@ async def websocket_endpoint(
                     logger.error(f"WebSocket error: {str(e)}", exc_info=True)
                     break
 
-            # Cancel ping task
-            if 'ping_task' in locals():
-                ping_task.cancel()
-                try:
-                    await ping_task
-                except asyncio.CancelledError:
-                    pass
-
         finally:
+            # Stop the writer task
+            writer_task.cancel()
+
             # Clean up connection
-            if connection_key and connection_key in active_connections:
+            unregister_websocket(websocket)
+
+            # Close WebSocket if still connected
+            if not socket_already_closed and is_websocket_connected(websocket):
+                await safe_close_websocket(websocket)
+
+    except Exception as e:
+        logger.error(f"WebSocket initialization error: {str(e)}", exc_info=True)
+        if not socket_already_closed:
+            await safe_close_websocket(websocket, code=1011)
+
+
+@router.websocket("/ws/user")
+async def user_websocket_endpoint(
+        websocket: WebSocket,
+        token: str = Query(...),
+        db: Session = Depends(get_db)
+):
+    """
+    WebSocket endpoint carrying every chat of a user over one connection.
+    The client sends "subscribe" / "unsubscribe" frames with a chat_id and
+    receives the same frames as on /ws/chat/{chat_id} for subscribed chats.
+    """
+    socket_already_closed = False
+    subscriptions: Dict[UUID, List[str]] = {}
+    loop_time = asyncio.get_running_loop().time
+
+    try:
+        # Validate token
+        token_data = validate_token(token)
+        user_id = token_data.get("sub") if token_data else None
+        if not user_id:
+            logger.warning("Invalid token for multiplexed WebSocket connection")
+            await safe_close_websocket(websocket, code=1008)
+            socket_already_closed = True
+            return
+
+        # Reject malformed user ids before accepting; subscriptions key on UUID(user_id)
+        UUID(user_id)
+
+        try:
+            await websocket.accept()
+            logger.info(f"Multiplexed WebSocket connection accepted for user {user_id}")
+        except Exception as e:
+            logger.error(f"Error accepting WebSocket connection: {str(e)}")
+            socket_already_closed = True
+            return
+
+        send_queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        writer_task = asyncio.create_task(connection_writer(websocket, send_queue))
+
+        queue_json(websocket, send_queue, {
+            "type": "connection_established",
+            "timestamp": str(loop_time())
+        })
+
+        try:
+            # receive_text() raises WebSocketDisconnect once the client is gone
+            while True:
                 try:
-                    if websocket in active_connections[connection_key]["connections"]:
-                        active_connections[connection_key]["connections"].remove(websocket)
+                    data = await websocket.receive_text()
+
+                    # Update activity timestamp of every subscribed chat
+                    now = loop_time()
+                    for connection_key in connection_keys.get(websocket, ()):
+                        last_activity[connection_key] = now
+
+                    # Parse message
+                    try:
+                        message_data = orjson.loads(data)
+                    except orjson.JSONDecodeError:
+                        logger.warning(f"Invalid JSON format received from user {user_id}")
+                        queue_frame(websocket, send_queue, INVALID_JSON_FRAME)
+                        continue
 
-                    # Remove the connection entry if no more active connections
-                    if not active_connections[connection_key]["connections"]:
-                        del active_connections[connection_key]
+                    # Handle message types; subscription frames need this connection's state
+                    message_type = message_data.get("type")
+                    subscription_handler = SUBSCRIPTION_HANDLERS.get(message_type)
+                    if subscription_handler:
+                        await subscription_handler(
+                            websocket, send_queue, message_data, user_id, subscriptions, db
+                        )
+                    else:
+                        handler = MESSAGE_HANDLERS.get(message_type, handle_unknown_message)
+                        await handler(websocket, send_queue, message_data, user_id, [])
+
+                except WebSocketDisconnect:
+                    logger.info(f"Multiplexed WebSocket disconnected for user {user_id}")
+                    socket_already_closed = True
+                    break
                 except Exception as e:
-                    logger.error(f"Error cleaning up connection: {str(e)}")
+                    logger.error(f"WebSocket error: {str(e)}", exc_info=True)
+                    break
+
+        finally:
+            # Stop the writer task
+            writer_task.cancel()
+
+            # Clean up every subscription
+            unregister_websocket(websocket)
 
             # Close WebSocket if still connected
             if not socket_already_closed and is_websocket_connected(websocket):
@@ -312,79 +525,473 @@ async def websocket_endpoint(
 
     except Exception as e:
         logger.error(f"WebSocket initialization error: {str(e)}", exc_info=True)
-        if not socket_already_closed and ws_id not in connection_ids:
+        if not socket_already_closed:
             await safe_close_websocket(websocket, code=1011)
 
 
-async def ping_client(websocket: WebSocket, connection_key: str):
-    """Periodically ping the client to keep the connection alive."""
+async def handle_ping(
+        websocket: WebSocket,
+        send_queue: asyncio.Queue,
+        message_data: Dict[str, Any],
+        user_id: str,
+        suggestions: List[str]
+):
+    """Respond to a client ping."""
+    queue_json(websocket, send_queue, {
+        "type": "pong",
+        "timestamp": message_data.get("timestamp")
+    })
+
+
+async def handle_stream_request(
+        websocket: WebSocket,
+        send_queue: asyncio.Queue,
+        message_data: Dict[str, Any],
+        user_id: str,
+        suggestions: List[str]
+):
+    """
+    Send the content streamed so far for a message. A reconnecting client may
+    pass message_ids instead to replay several messages with one Redis MGET.
+    """
+    message_ids = message_data.get("message_ids")
+    if isinstance(message_ids, list) and message_ids:
+        message_ids = [str(message_id) for message_id in message_ids]
+        logger.info(f"Stream request for {len(message_ids)} messages from user {user_id}")
+
+        # Get the content of every message in one round-trip
+        contents = await get_messages_content_from_redis(message_ids)
+
+        for message_id in message_ids:
+            queue_json(websocket, send_queue, {
+                "type": "stream_content",
+                "message_id": message_id,
+                "content": contents.get(message_id, "")
+            })
+        return
+
+    message_id = message_data.get("message_id")
+
+    if not message_id:
+        logger.warning(f"Missing message_id in stream_request from user {user_id}")
+        queue_frame(websocket, send_queue, MISSING_MESSAGE_ID_FRAME)
+        return
+
+    logger.info(f"Stream request for message {message_id} from user {user_id}")
+
+    # Get message content from Redis
+    content = await get_message_content_from_redis(message_id)
+
+    # Send content
+    queue_json(websocket, send_queue, {
+        "type": "stream_content",
+        "message_id": message_id,
+        "content": content
+    })
+
+
+async def handle_get_suggestions(
+        websocket: WebSocket,
+        send_queue: asyncio.Queue,
+        message_data: Dict[str, Any],
+        user_id: str,
+        suggestions: List[str]
+):
+    """Send the suggestions for this chat."""
+    queue_json(websocket, send_queue, {
+        "type": "suggestions",
+        "suggestions": suggestions or []
+    })
+
+
+async def handle_unknown_message(
+        websocket: WebSocket,
+        send_queue: asyncio.Queue,
+        message_data: Dict[str, Any],
+        user_id: str,
+        suggestions: List[str]
+):
+    """Report a message type the server doesn't handle."""
+    message_type = message_data.get("type")
+    logger.warning(f"Unknown message type '{message_type}' from user {user_id}")
+    queue_json(websocket, send_queue, {
+        "error": f"Unknown message type: {message_type}"
+    })
+
+
+# Handlers for client messages by their "type"
+MESSAGE_HANDLERS = {
+    "ping": handle_ping,
+    "stream_request": handle_stream_request,
+    "get_suggestions": handle_get_suggestions,
+}
+
+
+def get_message_chat_id(
+        websocket: WebSocket,
+        send_queue: asyncio.Queue,
+        message_data: Dict[str, Any]
+) -> Optional[UUID]:
+    """Read the chat_id of a multiplexed client message, reporting it if invalid."""
     try:
-        # Use a longer ping interval to reduce overhead
-        ping_interval = 45  # 45 seconds
+        return UUID(str(message_data.get("chat_id")))
+    except ValueError:
+        queue_frame(websocket, send_queue, INVALID_CHAT_ID_FRAME)
+        return None
 
-        while is_websocket_connected(websocket):
-            await asyncio.sleep(ping_interval)
 
-            if not is_websocket_connected(websocket):
-                break
+async def handle_subscribe(
+        websocket: WebSocket,
+        send_queue: asyncio.Queue,
+        message_data: Dict[str, Any],
+        user_id: str,
+        subscriptions: Dict[UUID, List[str]],
+        db: Session
+):
+    """Start sending a chat's broadcasts over a multiplexed connection."""
+    chat_id = get_message_chat_id(websocket, send_queue, message_data)
+    if chat_id is None:
+        return
+
+    now = asyncio.get_running_loop().time()
+    allowed, suggestions = await get_chat_access(db, chat_id, user_id, now)
+    if not allowed:
+        queue_json(websocket, send_queue, {
+            "error": "Chat not found or access denied",
+            "chat_id": str(chat_id)
+        })
+        return
+
+    register_connection((chat_id, UUID(user_id)), websocket, send_queue, now)
+    subscriptions[chat_id] = suggestions
+
+    queue_json(websocket, send_queue, {
+        "type": "subscribed",
+        "chat_id": str(chat_id),
+        "suggestions": suggestions
+    })
+
+
+async def handle_unsubscribe(
+        websocket: WebSocket,
+        send_queue: asyncio.Queue,
+        message_data: Dict[str, Any],
+        user_id: str,
+        subscriptions: Dict[UUID, List[str]],
+        db: Session
+):
+    """Stop sending a chat's broadcasts over a multiplexed connection."""
+    chat_id = get_message_chat_id(websocket, send_queue, message_data)
+    if chat_id is None:
+        return
+
+    if subscriptions.pop(chat_id, None) is not None:
+        unregister_connection((chat_id, UUID(user_id)), websocket)
+
+    queue_json(websocket, send_queue, {
+        "type": "unsubscribed",
+        "chat_id": str(chat_id)
+    })
+
+
+async def handle_get_chat_suggestions(
+        websocket: WebSocket,
+        send_queue: asyncio.Queue,
+        message_data: Dict[str, Any],
+        user_id: str,
+        subscriptions: Dict[UUID, List[str]],
+        db: Session
+):
+    """Send the suggestions for a subscribed chat."""
+    chat_id = get_message_chat_id(websocket, send_queue, message_data)
+    if chat_id is None:
+        return
+
+    queue_json(websocket, send_queue, {
+        "type": "suggestions",
+        "chat_id": str(chat_id),
+        "suggestions": subscriptions.get(chat_id) or []
+    })
+
+
+# Handlers for multiplexed client messages that use the connection's subscriptions
+SUBSCRIPTION_HANDLERS = {
+    "subscribe": handle_subscribe,
+    "unsubscribe": handle_unsubscribe,
+    "get_suggestions": handle_get_chat_suggestions,
+}
+
+
+async def broadcast_message(
+        chat_id: UUID,
+        user_id: UUID,
+        message: Union[Dict[str, Any], str],
+        merge_prefix: Optional[str] = None
+):
+    """Broadcast a message to all connections for a chat.
+
+    The message may be given already serialized to a JSON string, in which
+    case it is sent as is. merge_prefix marks a plain chunk frame that the
+    connection writers may merge with the next chunk of the same message.
+    With WS_REDIS_BROADCAST enabled the frame is published to every worker
+    instead of only this one's connections.
+    """
+    connection_key = (chat_id, user_id)
+    logger.info(f"Broadcasting message to chat {chat_id}, user {user_id}")
+
+    # Serialize once, every connection gets the same text frame
+    payload = message if isinstance(message, str) else orjson.dumps(message).decode()
+
+    if settings.WS_REDIS_BROADCAST:
+        await publish_broadcast(connection_key, payload, merge_prefix)
+    elif not deliver_broadcast(connection_key, payload, merge_prefix):
+        logger.warning(f"No active connections for chat {chat_id}, user {user_id}")
+
+
+def deliver_broadcast(
+        connection_key: Tuple[UUID, UUID],
+        payload: str,
+        merge_prefix: Optional[str] = None
+) -> int:
+    """Queue a frame for this worker's connections under the key. Returns how many got it."""
+    connections = active_connections.get(connection_key)
+    if not connections:
+        return 0
+
+    # Hand the frame to each connection's writer; a slow client doesn't hold up the others.
+    # Overflowed clients are unregistered after the loop, since that mutates the registry
+    delivered = 0
+    overflowed = []
+    for connection, queue in connections.items():
+        if enqueue_frame(queue, payload, merge_prefix):
+            delivered += 1
+        else:
+            overflowed.append(connection)
+
+    for connection in overflowed:
+        logger.warning(f"Send queue full for WebSocket {id(connection)}, closing slow connection")
+        unregister_websocket(connection)
+
+    logger.debug(f"Message queued for {delivered} connections for chat {connection_key[0]}")
+    return delivered
+
+
+def get_broadcast_redis() -> Redis:
+    """Get this worker's persistent Redis client for the broadcast bus."""
+    global broadcast_redis
+    if broadcast_redis is None:
+        broadcast_redis = Redis.from_url(settings.REDIS_URL)
+    return broadcast_redis
 
-            try:
-                await safe_send_json(websocket, {
-                    "type": "ping",
-                    "timestamp": asyncio.get_event_loop().time()
-                })
-
-                # Update activity timestamp
-                if connection_key in active_connections:
-                    active_connections[connection_key]["last_activity"] = asyncio.get_event_loop().time()
-            except Exception as e:
-                logger.error(f"Error sending ping: {str(e)}")
+
+async def publish_broadcast(
+        connection_key: Tuple[UUID, UUID],
+        payload: str,
+        merge_prefix: Optional[str] = None
+):
+    """Publish a frame on the broadcast bus for whichever worker holds the connections."""
+    chat_id, user_id = connection_key
+    try:
+        await get_broadcast_redis().publish(
+            BROADCAST_CHANNEL, orjson.dumps([chat_id, user_id, payload, merge_prefix])
+        )
+    except Exception as e:
+        logger.error(f"Error publishing broadcast for chat {chat_id}, user {user_id}: {str(e)}")
+
+
+async def listen_for_broadcasts():
+    """Deliver frames published on the broadcast bus to this worker's connections."""
+    while True:
+        pubsub = get_broadcast_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(BROADCAST_CHANNEL)
+            async for message in pubsub.listen():
+                chat_id, user_id, payload, merge_prefix = orjson.loads(message["data"])
+                deliver_broadcast((UUID(chat_id), UUID(user_id)), payload, merge_prefix)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast listener error, resubscribing: {str(e)}")
+            await asyncio.sleep(BROADCAST_RESUBSCRIBE_DELAY)
+        finally:
+            await pubsub.close()
+
+
+async def start_broadcast_listener():
+    """Start delivering broadcasts from other workers when WS_REDIS_BROADCAST is enabled."""
+    global broadcast_listener_task
+    if settings.WS_REDIS_BROADCAST and broadcast_listener_task is None:
+        broadcast_listener_task = asyncio.create_task(listen_for_broadcasts())
+        logger.info(f"Listening for WebSocket broadcasts on Redis channel {BROADCAST_CHANNEL}")
+
+
+async def stop_broadcast_listener():
+    """Stop the broadcast listener and close the broadcast bus Redis client."""
+    global broadcast_listener_task, broadcast_redis
+    if broadcast_listener_task is not None:
+        broadcast_listener_task.cancel()
+        try:
+            await broadcast_listener_task
+        except asyncio.CancelledError:
+            pass
+        broadcast_listener_task = None
+
+    if broadcast_redis is not None:
+        await broadcast_redis.close()
+        broadcast_redis = None
+
+
+def chunk_frame_prefix(message_id: Union[UUID, str]) -> str:
+    """JSON text every plain chunk frame of a message starts with, up to its content string."""
+    return f'{{"type":"chunk","message_id":"{message_id}","content":'
+
+
+def chunk_frame(prefix: str, content: str) -> str:
+    """Plain chunk frame built from its message's prefix; only the content gets encoded."""
+    return prefix + orjson.dumps(content).decode() + "}"
+
+
+def merge_chunk_frames(frames: List[Tuple[Optional[str], str]]) -> List[str]:
+    """Merge runs of plain chunk frames of the same message into single frames.
+
+    A plain chunk frame is its prefix followed by the JSON-encoded content
+    string and "}", so two frames merge by joining the encoded contents
+    between their quotes.
+    """
+    merged: List[str] = []
+    last_prefix = None
+    for prefix, payload in frames:
+        if (prefix is not None and prefix == last_prefix
+                and len(merged[-1]) + len(payload) - len(prefix) <= MAX_MERGED_FRAME_SIZE):
+            merged[-1] = merged[-1][:-2] + payload[len(prefix) + 1:]
+        else:
+            merged.append(payload)
+            last_prefix = prefix
+    return merged
+
+
+async def connection_writer(websocket: WebSocket, queue: asyncio.Queue):
+    """Send the frames queued for a connection, merging chunk frames that piled up.
+
+    The writer unregisters the connection when it stops, so broadcasts are
+    never queued for a connection nobody sends to.
+    """
+    try:
+        while True:
+            frames = [await queue.get()]
+            while not queue.empty():
+                frames.append(queue.get_nowait())
+
+            if CLOSE_SLOW_CLIENT in frames:
+                logger.info(f"Closing slow WebSocket {id(websocket)}")
+                await safe_close_websocket(websocket, code=1013, reason="Client too slow")
                 break
+
+            for payload in merge_chunk_frames(frames):
+                await websocket.send_text(payload)
     except asyncio.CancelledError:
-        # Task was cancelled - normal shutdown
+        # Task was cancelled - connection closed
         pass
     except Exception as e:
-        logger.error(f"Error in ping task: {str(e)}")
+        logger.error(f"Error sending over WebSocket {id(websocket)}: {str(e)}")
+    finally:
+        logger.debug(f"Writer stopped for WebSocket {id(websocket)}")
+        unregister_websocket(websocket)
 
 
-async def broadcast_message(chat_id: UUID, user_id: UUID, message: Dict[str, Any]):
-    """Broadcast a message to all connections for a chat."""
-    connection_key = f"{chat_id}:{user_id}"
-    logger.info(f"Broadcasting message to connection {connection_key}")
+async def broadcast_message_chunk(
+        chat_id: UUID,
+        user_id: UUID,
+        message_id: Union[UUID, str],
+        chunk: str,
+        extra: Optional[Dict[str, Any]] = None,
+        prefix: Optional[str] = None
+):
+    """Broadcast a message chunk to all connections for a chat.
 
-    if connection_key in active_connections:
-        # Make a copy to avoid modification during iteration
-        connections = active_connections[connection_key]["connections"].copy()
+    A chunk without extra fields is sent as a plain chunk frame, which the
+    connection writers may merge with the next chunk of the same message.
+    Callers sending many chunks of one message can pass its chunk_frame_prefix.
+    """
+    logger.debug(f"Broadcasting chunk for message {message_id} to chat {chat_id}, user {user_id}")
+    if extra:
+        payload = orjson.dumps({
+            "type": "chunk",
+            "message_id": str(message_id),
+            "content": chunk,
+            **extra
+        }).decode()
+        await broadcast_message(chat_id, user_id, payload)
+    else:
+        prefix = prefix or chunk_frame_prefix(message_id)
+        await broadcast_message(chat_id, user_id, chunk_frame(prefix, chunk), merge_prefix=prefix)
 
-        # Track successful sends
-        success_count = 0
 
-        for connection in connections:
-            if is_websocket_connected(connection):
-                try:
-                    await connection.send_json(message)
-                    success_count += 1
-                except Exception as e:
-                    logger.error(f"Error broadcasting message: {str(e)}")
+async def queue_message_chunk(
+        chat_id: UUID,
+        user_id: UUID,
+        message_id: UUID,
+        chunk: str,
+        **extra: Any
+):
+    """Queue a message chunk for broadcasting.
 
-        if success_count == 0 and connections:
-            logger.warning(f"Failed to send message to any of {len(connections)} connections for {connection_key}")
-        else:
-            logger.debug(f"Message sent to {success_count}/{len(connections)} connections for {connection_key}")
-    else:
-        logger.warning(f"No active connections for {connection_key}")
+    Chunks arriving within CHUNK_FLUSH_INTERVAL of each other are sent as one
+    "chunk" frame with their content concatenated. Extra fields (chat_name,
+    suggestions) are merged into that frame, the latest value winning.
 
+    With WS_REDIS_BROADCAST enabled the chunk is published before returning
+    instead: callbacks for one message may land on different workers, and a
+    buffer on one worker could otherwise be published after the completion
+    frame sent by another. Connection writers still merge queued chunk frames.
+    """
+    if settings.WS_REDIS_BROADCAST:
+        await broadcast_message_chunk(chat_id, user_id, message_id, chunk, extra)
+        return
+
+    key = (chat_id, user_id, message_id)
+    pending = pending_chunks.get(key)
+    if pending is None:
+        pending = pending_chunks[key] = {"parts": [], "extra": {}}
+        pending["task"] = asyncio.create_task(_send_pending_chunks(key))
+
+    pending["parts"].append(chunk)
+    if extra:
+        pending["extra"].update(extra)
+
+
+async def _send_pending_chunks(key: Tuple[UUID, UUID, UUID]):
+    """Broadcast queued chunks for a message until no new ones arrive."""
+    chat_id, user_id, message_id = key
+    # Formatted once per message rather than on every flush
+    message_id_str = str(message_id)
+    merge_prefix = chunk_frame_prefix(message_id_str)
+    try:
+        while True:
+            await asyncio.sleep(CHUNK_FLUSH_INTERVAL)
 
-async def broadcast_message_chunk(chat_id: UUID, user_id: UUID, message_id: UUID, chunk: str):
-    """Broadcast a message chunk to all connections for a chat."""
-    message = {
-        "type": "chunk",
-        "message_id": str(message_id),
-        "content": chunk
-    }
+            pending = pending_chunks[key]
+            if not pending["parts"]:
+                break
+
+            extra = pending["extra"]
+            content = "".join(pending["parts"])
+            pending["parts"] = []
+            pending["extra"] = {}
+
+            # Plain chunks only encode their content onto the message's prefix
+            await broadcast_message_chunk(
+                chat_id, user_id, message_id_str, content, extra, prefix=merge_prefix
+            )
+    finally:
+        pending_chunks.pop(key, None)
 
-    logger.debug(f"Broadcasting chunk for message {message_id} to chat {chat_id}, user {user_id}")
-    await broadcast_message(chat_id, user_id, message)
+
+async def flush_message_chunks(chat_id: UUID, user_id: UUID, message_id: UUID):
+    """Wait until every queued chunk of a message has been broadcast."""
+    pending = pending_chunks.get((chat_id, user_id, message_id))
+    if pending:
+        await pending["task"]
 
 
 async def broadcast_message_complete(
@@ -409,19 +1016,19 @@ async def broadcast_message_complete(
     }
 
     if sources:
-        # Process sources to ensure they're in the right format
-        processed_sources = []
-        for source in sources:
-            # Standardize source fields - ensure we have the expected properties
-            processed_source = {
-                "id": source.get("id", ""),
-                "title": source.get("source", "") or source.get("title", ""),
-                "content": source.get("page", None),  # Use page directly, without "Page " prefix
-                "url": source.get("id", "")  # Use id as url for reference matching
+        # Standardize source fields - ensure we have the expected properties.
+        # content is the page as is, without a "Page " prefix, and url repeats
+        # the id for reference matching
+        message["sources"] = [
+            {
+                "id": source_id,
+                "title": source.get("source") or source.get("title", ""),
+                "content": source.get("page"),
+                "url": source_id
             }
-            processed_sources.append(processed_source)
-
-        message["sources"] = processed_sources
+            for source in sources
+            for source_id in (source.get("id", ""),)
+        ]
 
     if suggestions:
         message["suggestions"] = suggestions
@@ -16,6 +16,17 @@ class Settings(BaseSettings):
     APP_PORT: int = 8000
     DEBUG: bool = True
 
+    # WebSocket keepalive, handled by the server with protocol-level PING frames
+    WS_PING_INTERVAL: float = 20.0  # seconds between pings
+    WS_PING_TIMEOUT: float = 20.0  # seconds to wait for a pong before closing
+
+    # Fan WebSocket broadcasts out through Redis pub/sub so they reach clients
+    # connected to any worker; needed when running more than one worker
+    WS_REDIS_BROADCAST: bool = False
+
+    # How long streamed chunks are collected before being sent as one WebSocket frame
+    WS_CHUNK_FLUSH_INTERVAL: float = 0.02  # seconds
+
     # Public facing URL for AI service callbacks
     # If set, this will be used instead of the request base URL for callbacks
     # Example: "https://api.example.com"
@@ -32,6 +43,15 @@ class Settings(BaseSettings):
     # SQLAlchemy settings - disable echo to reduce logging
     SQLALCHEMY_ECHO: bool = False
 
+    # Connection pool settings
+    DB_POOL_SIZE: int = 50
+    DB_MAX_OVERFLOW: int = 20  # extra connections beyond DB_POOL_SIZE
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+
+    # Worker threads for sync endpoints and run_in_threadpool calls. Each one holds at most
+    # one DB connection, so this matches DB_POOL_SIZE + DB_MAX_OVERFLOW
+    THREADPOOL_SIZE: int = 70
+
     # JWT settings
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
@@ -41,6 +61,7 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50  # connections in the API server's shared pool
 
     # Celery settings
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
@@ -0,0 +1,39 @@
+from typing import Dict, FrozenSet, Tuple
+
+# General (top-level) clusters used to categorize chats
+GENERAL_CLUSTERS: Tuple[str, ...] = (
+    'Общие вопросы о работе с системой', 'Процессы закупок', 'Работа с контрактами',
+    'Оферты и коммерческие предложения', 'Документы', 'Работа с категориями продукции',
+    'Техническая поддержка', 'Чаты и обсуждения', 'Финансовые операции',
+    'Новости и обновления', 'Регуляторные и юридические вопросы', 'Ошибки и предупреждения',
+    'Бессмысленный запрос'
+)
+
+# Same clusters as a set for membership tests
+GENERAL_CLUSTER_SET: FrozenSet[str] = frozenset(GENERAL_CLUSTERS)
+
+# Sub-clusters returned by the AI service, grouped by their general cluster
+SUB_CLUSTERS: Dict[str, Tuple[str, ...]] = {
+    'Общие вопросы о работе с системой': ('Регистрация и вход в систему', 'Настройка личного кабинета',
+                                          'Поиск информации'),
+    'Процессы закупок': ('Прямые закупки', 'Котировочные сессии', 'Закупки по потребностям'),
+    'Работа с контрактами': ('Формирование и подписание контрактов', 'Исполнение контрактов'),
+    'Оферты и коммерческие предложения': ('Создание и редактирование оферт', 'Запросы на коммерческие предложения'),
+    'Документы': ('Добавление и удаление документов', 'Редактирование и обновление документации'),
+    'Работа с категориями продукции': ('Выбор конечной категории продукции', 'Использование справочников'),
+    'Техническая поддержка': ('Решение проблем с системой', 'Вопросы о доступности функций'),
+    'Чаты и обсуждения': ('Использование чатов', 'Обсуждение конкретных закупок и контрактов'),
+    'Финансовые операции': ('Банковские гарантии и финансовые инструменты', 'Логистика и связанные услуги'),
+    'Новости и обновления': ('Информация о новых возможностях портала', 'Новости о тендерах и закупках'),
+    'Регуляторные и юридические вопросы': ('Вопросы, связанные с нормативными документами',
+                                           'Правила участия в закупках'),
+    'Ошибки и предупреждения': ('Вопросы о неправильных действиях', 'Работа с блокировками или жалобами'),
+    'Бессмысленный запрос': ()
+}
+
+# Reverse index: sub-cluster -> its general cluster
+SUB_TO_GENERAL: Dict[str, str] = {
+    sub: general
+    for general, subs in SUB_CLUSTERS.items()
+    for sub in subs
+}
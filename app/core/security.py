@@ -1,5 +1,7 @@
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 from jose import jwt
 from passlib.context import CryptContext
@@ -13,6 +15,19 @@ from app.db.session import get_db
 from app.db.models import User
 from sqlalchemy.orm import Session
 
+# Payloads of recently validated tokens, by token - structure:
+# {
+#   token: (expires_at, payload)
+# }
+validated_token_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+validated_token_cache_lock = threading.Lock()
+
+# Validated tokens kept before the oldest ones are evicted
+VALIDATED_TOKEN_CACHE_SIZE = 10000
+
+# Seconds a validated token is trusted without decoding it again (never past its exp)
+VALIDATED_TOKEN_CACHE_TTL = 60
+
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -135,8 +150,19 @@ async def get_current_user(
 def validate_token(token: str) -> Dict[str, Any]:
     """
     Validate a JWT token and return the payload.
-    Used for WebSocket authentication.
+    Used for WebSocket authentication. Valid tokens are remembered for up to
+    VALIDATED_TOKEN_CACHE_TTL seconds, so quick reconnects don't verify the
+    same token again.
     """
+    now = time.time()
+    cached = validated_token_cache.get(token)
+    if cached is not None:
+        expires_at, payload = cached
+        if expires_at > now:
+            return payload
+        with validated_token_cache_lock:
+            validated_token_cache.pop(token, None)
+
     try:
         # Decode JWT
         payload = jwt.decode(
@@ -144,6 +170,15 @@ def validate_token(token: str) -> Dict[str, Any]:
             settings.JWT_SECRET,
             algorithms=[settings.JWT_ALGORITHM]
         )
-        return payload
     except jwt.JWTError:
-        return None
\ No newline at end of file
+        return None
+
+    # Only tokens with an expiry are cached, and only briefly, so a cached token can't outlive it
+    if "exp" in payload:
+        expires_at = min(payload["exp"], now + VALIDATED_TOKEN_CACHE_TTL)
+        with validated_token_cache_lock:
+            if len(validated_token_cache) >= VALIDATED_TOKEN_CACHE_SIZE:
+                validated_token_cache.pop(next(iter(validated_token_cache)), None)
+            validated_token_cache[token] = (expires_at, payload)
+
+    return payload
\ No newline at end of file
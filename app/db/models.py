@@ -5,7 +5,7 @@ from datetime import datetime
 from sqlalchemy import (
     Boolean, Column, ForeignKey, Integer, String,
     Text, DateTime, Enum as SQLEnum, LargeBinary,
-    Float, Table
+    Float, Table, Index
 )
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
@@ -138,6 +138,11 @@ class File(Base):
     message_files = relationship("MessageFile", back_populates="file", cascade="all, delete-orphan")
     preview = relationship("FilePreview", back_populates="file", uselist=False, cascade="all, delete-orphan")
 
+    # Serves the per-user file list, newest first
+    __table_args__ = (
+        Index("ix_file_user_id_created_at", "user_id", "created_at"),
+    )
+
     def __repr__(self):
         return f"<File {self.name}>"
 
@@ -192,11 +197,22 @@ class Source(Base):
     title = Column(String, nullable=False)
     url = Column(String, nullable=True)
     content = Column(Text, nullable=True)
+    # Reference document resolved when the source is stored
+    document_dir = Column(String, nullable=True)
+    resolved_path = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
     message = relationship("Message", back_populates="sources")
 
+    # Serves reference lookups by message and reference number without reading the table
+    __table_args__ = (
+        Index(
+            "ix_source_message_id_url", "message_id", "url",
+            postgresql_include=["title", "content", "document_dir", "resolved_path"]
+        ),
+    )
+
     def __repr__(self):
         return f"<Source {self.title} for {self.message_id}>"
 
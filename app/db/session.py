@@ -3,11 +3,13 @@ from sqlalchemy.orm import sessionmaker, Session
 
 from app.core.config import settings
 
+# Postgres max_connections must cover DB_POOL_SIZE + DB_MAX_OVERFLOW for every worker process
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,  # Health check for connections
-    pool_size=50,         # adjust to your expected load
-    max_overflow=20,      # extra connections beyond pool_size
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,  # Replace connections before server/proxy idle timeouts
 )
 
 # Create session factory
@@ -1,14 +1,19 @@
+import asyncio
 import logging
 import os
+
+import anyio.to_thread
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import ValidationError
 
 from app.core.config import settings
+from app.db.session import engine
 from app.api import auth, chats, files, websockets, admin, documents
+from app.tasks import message_tasks
 
 # Set up logging
 logging.basicConfig(
@@ -29,7 +34,8 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="API for Chat Application",
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware with more permissive settings
@@ -53,6 +59,34 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.on_event("startup")
+async def configure_threadpool():
+    """
+    Size the threadpool running sync endpoints and blocking DB calls to the DB pool,
+    instead of anyio's default of 40 threads.
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    logger.info(f"Running on event loop {type(asyncio.get_running_loop()).__module__}")
+
+
+@app.on_event("startup")
+async def start_websocket_broadcasts():
+    """Start receiving WebSocket broadcasts published by other workers."""
+    await websockets.start_broadcast_listener()
+
+
+@app.on_event("shutdown")
+async def stop_websocket_broadcasts():
+    """Stop receiving WebSocket broadcasts and close the Redis client."""
+    await websockets.stop_broadcast_listener()
+
+
+@app.on_event("shutdown")
+async def close_redis_client():
+    """Close the shared Redis client used for streamed message content."""
+    await message_tasks.close_redis()
+
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(chats.router, prefix="/api")
@@ -75,6 +109,20 @@ async def health_check():
     }
 
 
+# Connection pool metrics
+@app.get("/metrics")
+async def metrics():
+    pool = engine.pool
+    return {
+        "db_pool": {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow()
+        }
+    }
+
+
 @app.get("/")
 async def root():
     return {
@@ -189,5 +237,8 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.APP_HOST,
         port=settings.APP_PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        loop="uvloop",
+        ws_ping_interval=settings.WS_PING_INTERVAL,
+        ws_ping_timeout=settings.WS_PING_TIMEOUT
     )
\ No newline at end of file
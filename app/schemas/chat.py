@@ -1,7 +1,7 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 from datetime import datetime
 from uuid import UUID
-from pydantic import BaseModel, Field, root_validator, validator
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator, root_validator, validator
 
 from app.db.models import MessageType, MessageStatus, ReactionType
 
@@ -19,8 +19,7 @@ class Source(SourceBase):
     message_id: UUID
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ReactionBase(BaseModel):
@@ -34,20 +33,18 @@ class Reaction(ReactionBase):
     message_id: UUID
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class FileReference(BaseModel):
     """File reference schema for messages."""
-    id: UUID
+    # Built from MessageFile rows, whose file_id (not their own id) identifies the file
+    id: UUID = Field(validation_alias=AliasChoices("file_id", "id"))
     name: str
     file_type: str
     preview_url: Optional[str] = None
 
-    class Config:
-        from_attributes = True
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(from_attributes=True, arbitrary_types_allowed=True, populate_by_name=True)
 
 
 class MessageBase(BaseModel):
@@ -73,36 +70,15 @@ class Message(MessageBase):
     files: Optional[List[FileReference]] = []
     reactions: Optional[List[Reaction]] = []
 
-    class Config:
-        from_attributes = True
-        arbitrary_types_allowed = True
+    model_config = ConfigDict(from_attributes=True, arbitrary_types_allowed=True)
 
+    @field_validator("files", mode="before")
     @classmethod
-    def from_orm(cls, obj):
-        """Custom from_orm to handle files."""
-        # Create a dict for normal fields
-        obj_dict = {}
-        for field in cls.__fields__:
-            if field != 'files' and hasattr(obj, field):
-                obj_dict[field] = getattr(obj, field)
-
-        # Process files separately
-        if hasattr(obj, 'files') and obj.files:
-            files_data = []
-            for file_ref in obj.files:
-                if hasattr(file_ref, 'file') and file_ref.file:
-                    file_data = {
-                        'id': file_ref.file_id,
-                        'name': file_ref.file.name,
-                        'file_type': file_ref.file.file_type.value,
-                    }
-                    # Add preview URL if available
-                    if hasattr(file_ref.file, 'preview') and file_ref.file.preview:
-                        file_data['preview_url'] = f"/api/files/{file_ref.file_id}/preview"
-                    files_data.append(file_data)
-            obj_dict['files'] = files_data
-
-        return cls(**obj_dict)
+    def skip_missing_files(cls, files):
+        """Leave out attachments whose file no longer exists."""
+        if not files:
+            return files
+        return [file_ref for file_ref in files if getattr(file_ref, "file", True) is not None]
 
 
 class ChatBase(BaseModel):
@@ -124,13 +100,22 @@ class Chat(ChatBase):
     messages: Optional[List[Message]] = []
     suggestions: Optional[List[str]] = []
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChatListItem(ChatBase):
+    """Chat list item schema, without messages or suggestions."""
+    id: UUID
+    user_id: UUID
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ChatList(BaseModel):
     """Chat list schema."""
-    items: List[Chat]
+    items: List[ChatListItem]
     total: int
 
 
@@ -142,4 +127,15 @@ class MessageList(BaseModel):
 
 class ReactionCreate(BaseModel):
     """Reaction creation schema."""
-    reaction_type: ReactionType
\ No newline at end of file
+    reaction_type: ReactionType
+
+
+class CallbackPayload(BaseModel):
+    """AI service streaming callback schema."""
+    chunk_id: Union[int, str]
+    content: str
+    is_final: bool
+    name: Optional[str] = None
+    suggestions: Optional[List[str]] = []
+    context_used: Optional[List[Dict[str, Any]]] = []
+    content_used: Optional[List[Dict[str, Any]]] = []
@@ -1,16 +1,26 @@
 import logging
+import threading
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID
 
-from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session, selectinload, joinedload, load_only
 from fastapi import HTTPException, status
 
 from app.db.models import Chat, Message, MessageType, MessageStatus, MessageFile, Source, Reaction, ReactionType, File
 from app.schemas.chat import ChatCreate, MessageCreate, ReactionCreate
+from app.services.document_service import resolve_source_reference
 
 logger = logging.getLogger(__name__)
 
+# Owners of chats with AI messages receiving callbacks, keyed by (chat_id, message_id).
+# Chat ownership never changes, so entries can't go stale; size is bounded by evicting the oldest.
+# Filled from both the event loop and threadpool workers, so writes are serialized by a lock.
+message_owner_cache: Dict[Tuple[UUID, UUID], UUID] = {}
+message_owner_cache_lock = threading.Lock()
+MESSAGE_OWNER_CACHE_SIZE = 8192
+
 
 def get_chats(db: Session, user_id: UUID, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
     """
@@ -24,9 +34,9 @@ def get_chats(db: Session, user_id: UUID, skip: int = 0, limit: int = 100) -> Di
         total = db.query(Chat).filter(Chat.user_id == user_id).count()
         logger.info(f"Total chats found: {total}")
 
-        # Get chats with eager loading of messages and related data
+        # Get only the columns shown in the chat list - messages and JSON columns aren't needed there
         chats = db.query(Chat).filter(Chat.user_id == user_id).options(
-            selectinload(Chat.messages).selectinload(Message.files).joinedload(MessageFile.file)
+            load_only(Chat.id, Chat.user_id, Chat.title, Chat.created_at, Chat.updated_at)
         ).order_by(Chat.updated_at.desc()).offset(skip).limit(limit).all()
 
         logger.info(f"Successfully fetched {len(chats)} chats")
@@ -84,7 +94,7 @@ def get_messages(db: Session, chat_id: UUID, skip: int = 0, limit: int = 100) ->
 
         # Get messages with eager loading of files and file data
         messages = db.query(Message).filter(Message.chat_id == chat_id).options(
-            selectinload(Message.files).joinedload(MessageFile.file),
+            selectinload(Message.files).joinedload(MessageFile.file).joinedload(File.preview),
             selectinload(Message.reactions),
             selectinload(Message.sources)
         ).order_by(Message.created_at).offset(skip).limit(limit).all()
@@ -118,11 +128,15 @@ def create_user_message(db: Session, chat_id: UUID, message_data: MessageCreate)
 
         # Add files if any
         if message_data.file_ids:
+            # Check which files exist with a single query
+            existing_file_ids = {
+                file_id for (file_id,) in
+                db.query(File.id).filter(File.id.in_(message_data.file_ids)).all()
+            }
             for file_id in message_data.file_ids:
                 try:
                     # Check if file exists
-                    file = db.query(File).filter(File.id == file_id).first()
-                    if not file:
+                    if file_id not in existing_file_ids:
                         logger.warning(f"File {file_id} not found")
                         continue
 
@@ -223,9 +237,6 @@ def update_ai_message(db: Session, message_id: UUID, content: str, status: Messa
     message.content = content
     message.status = status
 
-    db.commit()
-    db.refresh(message)
-
     # Add sources if any
     if sources:
         # First clean up any existing sources
@@ -243,16 +254,116 @@ def update_ai_message(db: Session, message_id: UUID, content: str, status: Messa
                 message_id=message_id,
                 title=title,
                 url=str(ref_id),  # Store raw reference ID in url
-                content=str(page) if page else None  # Store just the page number without prefix
+                content=str(page) if page else None,  # Store just the page number without prefix
+                **resolve_source_reference(title, str(page) if page else None)
             )
             db.add(source)
 
         logger.info(f"Added {len(sources)} sources to message {message_id}")
-        db.commit()
+
+    # Content, status and sources are stored in one transaction
+    db.commit()
 
     return message
 
 
+def complete_ai_message(db: Session, message_id: UUID, content: str,
+                        sources: List[Dict[str, Any]] = None) -> bool:
+    """
+    Store the final content of a streamed AI message and replace its sources.
+
+    Args:
+        db: Database session
+        message_id: ID of the message to complete
+        content: Full accumulated message content
+        sources: Optional list of references from the AI callback ("id", "source", "page")
+
+    Returns:
+        False if the message no longer exists, True otherwise
+    """
+    # Direct UPDATE skips the ORM flush of the (potentially large) content
+    result = db.execute(
+        update(Message)
+        .where(Message.id == message_id)
+        .values(content=content, status=MessageStatus.COMPLETED)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        logger.warning(f"Message {message_id} no longer exists, not completing it")
+        return False
+
+    # Process sources/references if provided
+    if sources:
+        # First remove any existing sources
+        db.query(Source).filter(Source.message_id == message_id).delete(synchronize_session=False)
+
+        # Then add the new sources with one multi-row INSERT.
+        # Only create a source if we have both id and source name
+        source_rows = [
+            {
+                "message_id": message_id,
+                "title": ref["source"],
+                "content": str(ref["page"]) if ref.get("page") else None,  # Just store the page number
+                "url": str(ref["id"]),  # Store reference number in the url field
+                **resolve_source_reference(ref["source"], str(ref["page"]) if ref.get("page") else None)
+            }
+            for ref in sources
+            if ref.get("id") and ref.get("source")
+        ]
+        if source_rows:
+            db.execute(insert(Source), source_rows)
+
+        logger.info(f"Created {len(source_rows)} sources for message {message_id}")
+
+    # Message update and sources are stored in a single transaction
+    db.commit()
+    return True
+
+
+def cache_message_owner_id(chat_id: UUID, message_id: UUID, user_id: UUID) -> None:
+    """
+    Remember the owner of the chat an AI message belongs to.
+    """
+    with message_owner_cache_lock:
+        if len(message_owner_cache) >= MESSAGE_OWNER_CACHE_SIZE:
+            message_owner_cache.pop(next(iter(message_owner_cache)), None)
+        message_owner_cache[(chat_id, message_id)] = user_id
+
+
+def get_cached_message_owner_id(chat_id: UUID, message_id: UUID) -> Optional[UUID]:
+    """
+    Get the cached owner of the chat a message belongs to, if known.
+    """
+    return message_owner_cache.get((chat_id, message_id))
+
+
+def forget_message_owner_id(chat_id: UUID, message_id: UUID) -> None:
+    """
+    Drop a message from the owner cache once it no longer receives callbacks.
+    """
+    with message_owner_cache_lock:
+        message_owner_cache.pop((chat_id, message_id), None)
+
+
+def load_message_owner_id(db: Session, chat_id: UUID, message_id: UUID) -> Optional[UUID]:
+    """
+    Get the owner of the chat a message belongs to from the database and cache it.
+    Returns None if the message does not exist in this chat.
+    """
+    user_id = db.query(Chat.user_id).join(
+        Message, Message.chat_id == Chat.id
+    ).filter(
+        Message.id == message_id,
+        Chat.id == chat_id
+    ).scalar()
+
+    if user_id is not None:
+        cache_message_owner_id(chat_id, message_id, user_id)
+
+    return user_id
+
+
 def add_reaction(db: Session, message_id: UUID, reaction_data: ReactionCreate) -> Reaction:
     """
     Add a reaction to a message.
@@ -0,0 +1,164 @@
+import os
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+
+# Define the references directory
+REFERENCES_DIR = Path("static/references")
+
+# Formats of direct (non-page) reference files, in order of preference
+REFERENCE_FILE_EXTENSIONS = ('.png', '.pdf', '.xlsx', '.docx', '.jpg', '.jpeg')
+
+# Direct reference files by document name - rebuilt when REFERENCES_DIR changes
+reference_file_index: Dict[str, Any] = {"files": {}, "mtime": None, "checked_at": float("-inf")}
+
+# How often REFERENCES_DIR is checked for changes
+REFERENCE_INDEX_TTL = 60  # seconds
+
+# Mapping for document names to directories (read-only)
+DOCUMENT_MAPPING = MappingProxyType({
+    # Document name variations (lowercase) -> directory name
+    "инструкция_по_работе_с_порталом_для_поставщика": "инструкция_по_работе_с_порталом_для_поставщика",
+    "инструкция по работе с порталом для поставщика": "инструкция_по_работе_с_порталом_для_поставщика",
+    "инструкция_по_работе_с_порталом_для_поставщика.pdf": "инструкция_по_работе_с_порталом_для_поставщика",
+    "инструкция_по_работе_с_порталом_для_заказчика": "инструкция_по_работе_с_порталом_для_заказчика",
+    "инструкция по работе с порталом для заказчика": "инструкция_по_работе_с_порталом_для_заказчика",
+    "инструкция_по_работе_с_порталом_для_заказчика.pdf": "инструкция_по_работе_с_порталом_для_заказчика",
+    "инструкция_по_электронному_актированию": "инструкция_по_электронному_актированию",
+    "инструкция по электронному актированию": "инструкция_по_электронному_актированию",
+    "инструкция_по_электронному_актированию.pdf": "инструкция_по_электронному_актированию",
+    "регламент_информационного_взаимодействия": "регламент_информационного_взаимодействия",
+    "регламент информационного взаимодействия": "регламент_информационного_взаимодействия",
+    "регламент_информационного_взаимодействия.pdf": "регламент_информационного_взаимодействия",
+    "xlsx": "xlsx",
+})
+
+# All document name variations compiled into one pattern for partial matching,
+# longer variations first so the most specific one wins at a given position
+DOCUMENT_NAME_RE = re.compile(
+    "|".join(map(re.escape, sorted(DOCUMENT_MAPPING, key=len, reverse=True)))
+)
+
+# Display names for documents (read-only)
+DOCUMENT_DISPLAY_NAMES = MappingProxyType({
+    "инструкция_по_работе_с_порталом_для_поставщика": "Инструкция по работе с порталом для поставщика",
+    "инструкция_по_работе_с_порталом_для_заказчика": "Инструкция по работе с порталом для заказчика",
+    "инструкция_по_электронному_актированию": "Инструкция по электронному актированию",
+    "регламент_информационного_взаимодействия": "Регламент информационного взаимодействия",
+    "xlsx": "Файл Excel"
+})
+
+# Prefix the AI service adds to table references
+TABLE_PREFIX = "таблица из файла"
+
+
+@lru_cache(maxsize=1024)
+def normalize_document_name(source_name: str) -> str:
+    """
+    Normalize a document name from the AI response to match our directory structure.
+    """
+    if not source_name:
+        return ""
+
+    # Convert to lowercase for case-insensitive matching
+    name_lower = source_name.lower()
+
+    # Remove any "таблица из файла" prefix
+    if TABLE_PREFIX in name_lower:
+        name_lower = name_lower.replace(TABLE_PREFIX, "")
+    name_lower = name_lower.strip()
+
+    # Try direct mapping
+    directory = DOCUMENT_MAPPING.get(name_lower)
+    if directory is not None:
+        return directory
+
+    # Try partial matching if no exact match
+    match = DOCUMENT_NAME_RE.search(name_lower)
+    if match:
+        return DOCUMENT_MAPPING[match.group()]
+
+    # Return as is if no match found
+    return name_lower
+
+
+def _build_reference_file_index() -> Dict[str, Path]:
+    """
+    Map each file stem in REFERENCES_DIR to its file, preferring formats in REFERENCE_FILE_EXTENSIONS order.
+    """
+    index: Dict[str, Path] = {}
+    try:
+        with os.scandir(REFERENCES_DIR) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext not in REFERENCE_FILE_EXTENSIONS or not entry.is_file():
+                    continue
+                current = index.get(stem)
+                if current is None or (
+                        REFERENCE_FILE_EXTENSIONS.index(ext) < REFERENCE_FILE_EXTENSIONS.index(current.suffix)):
+                    index[stem] = REFERENCES_DIR / entry.name
+    except FileNotFoundError:
+        pass
+    return index
+
+
+def get_reference_file(document_dir: str) -> Optional[Path]:
+    """
+    Get the direct reference file for a document from the cached directory index.
+    The directory is re-checked at most every REFERENCE_INDEX_TTL seconds and
+    the index rebuilt only if its modification time changed.
+    """
+    now = time.monotonic()
+    if now - reference_file_index["checked_at"] > REFERENCE_INDEX_TTL:
+        reference_file_index["checked_at"] = now
+        try:
+            mtime = os.stat(REFERENCES_DIR).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != reference_file_index["mtime"] or mtime is None:
+            reference_file_index["files"] = _build_reference_file_index()
+            reference_file_index["mtime"] = mtime
+
+    return reference_file_index["files"].get(document_dir)
+
+
+def parse_page_number(source_content: Optional[str]) -> Optional[str]:
+    """
+    Extract the page number stored in a source's content (format like "Page 9" or just the number).
+    """
+    if not source_content:
+        return None
+
+    if source_content.startswith("Page "):
+        return source_content.replace("Page ", "")
+    return source_content
+
+
+def resolve_reference_path(document_dir: str, page_number: Optional[str]) -> Path:
+    """
+    Determine the file path of a document reference.
+    The returned path may not exist if the document hasn't been processed yet.
+    """
+    if page_number and page_number.isdigit():
+        # It's a page in a directory
+        return REFERENCES_DIR / document_dir / f"{page_number}.png"
+
+    # Assume it's a direct file reference, in whichever format exists
+    return get_reference_file(document_dir) or REFERENCES_DIR / f"{document_dir}.png"
+
+
+def resolve_source_reference(title: str, page: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Resolve the document directory and existing file of a source when it is stored,
+    so serving the reference doesn't have to repeat the lookup.
+    """
+    document_dir = normalize_document_name(title)
+    image_path = resolve_reference_path(document_dir, page)
+
+    return {
+        "document_dir": document_dir,
+        "resolved_path": str(image_path) if image_path.exists() else None
+    }
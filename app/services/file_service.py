@@ -1,4 +1,5 @@
 import os
+import shutil
 import uuid
 import mimetypes
 from typing import List, Optional, Dict, Any
@@ -6,11 +7,14 @@ from pathlib import Path
 from uuid import UUID
 
 from fastapi import UploadFile, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, raiseload
 
 from app.core.config import settings
 from app.db.models import File, FileType, FilePreview, User
 
+# Size of the chunks uploads are copied to disk in
+UPLOAD_COPY_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
 
 def get_file_type(mime_type: str) -> FileType:
     """
@@ -36,6 +40,20 @@ def get_file_type(mime_type: str) -> FileType:
         return FileType.OTHER
 
 
+def get_upload_size(upload_file: UploadFile) -> int:
+    """
+    Get the size of an uploaded file.
+    Uses the size recorded while the upload was parsed, seeking only if it isn't known.
+    """
+    if upload_file.size is not None:
+        return upload_file.size
+
+    upload_file.file.seek(0, 2)  # Seek to end
+    file_size = upload_file.file.tell()
+    upload_file.file.seek(0)  # Reset to beginning
+    return file_size
+
+
 def save_upload_file(upload_file: UploadFile, upload_dir: Path) -> Dict[str, Any]:
     """
     Save an uploaded file to disk.
@@ -52,10 +70,10 @@ def save_upload_file(upload_file: UploadFile, upload_dir: Path) -> Dict[str, Any
     if not content_type:
         content_type = mimetypes.guess_type(upload_file.filename)[0] or 'application/octet-stream'
 
-    # Save file to disk
+    # Save file to disk, copying in chunks rather than reading the whole upload into memory
     try:
         with open(file_path, "wb") as buffer:
-            buffer.write(upload_file.file.read())
+            shutil.copyfileobj(upload_file.file, buffer, UPLOAD_COPY_CHUNK_SIZE)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -75,9 +93,11 @@ def save_upload_file(upload_file: UploadFile, upload_dir: Path) -> Dict[str, Any
     }
 
 
-def create_file(db: Session, user: User, file_data: Dict[str, Any]) -> File:
+def create_file(db: Session, user: User, file_data: Dict[str, Any], commit: bool = True) -> File:
     """
     Create a file record in the database.
+    With commit=False the record is only flushed (so its ID is set) and
+    the caller commits, allowing several records to share one transaction.
     """
     # Create file record
     file_record = File(
@@ -91,17 +111,24 @@ def create_file(db: Session, user: User, file_data: Dict[str, Any]) -> File:
     )
 
     db.add(file_record)
+    if not commit:
+        db.flush()
+        return file_record
+
     db.commit()
     db.refresh(file_record)
 
     return file_record
 
 
-def get_file(db: Session, file_id: UUID) -> Optional[File]:
+def get_file(db: Session, file_id: UUID, with_preview: bool = False) -> Optional[File]:
     """
     Get a file by ID.
+    With with_preview, the preview is loaded in the same query; any other
+    relationship access raises instead of lazily issuing another SELECT.
     """
-    return db.query(File).filter(File.id == file_id).first()
+    options = [joinedload(File.preview)] if with_preview else []
+    return db.query(File).options(*options, raiseload("*")).filter(File.id == file_id).first()
 
 
 def get_user_files(db: Session, user_id: UUID, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
@@ -110,8 +137,9 @@ def get_user_files(db: Session, user_id: UUID, skip: int = 0, limit: int = 100)
     """
     # Get files with count
     total = db.query(File).filter(File.user_id == user_id).count()
-    files = db.query(File).filter(File.user_id == user_id).order_by(File.created_at.desc()).offset(skip).limit(
-        limit).all()
+    # FileList doesn't serialize any relationship, so any lazy load here would be an N+1
+    files = db.query(File).filter(File.user_id == user_id).options(raiseload("*")).order_by(
+        File.created_at.desc()).offset(skip).limit(limit).all()
 
     return {
         "items": files,
@@ -136,6 +164,8 @@ def save_file_preview(db: Session, file_id: UUID, preview_data: bytes) -> FilePr
     if existing_preview:
         existing_preview.data = preview_data
         db.commit()
+        # Keep the on-disk copy served by the preview endpoint in sync, once the row is saved
+        write_preview_cache(file_id, preview_data)
         return existing_preview
 
     # Create new preview
@@ -147,10 +177,40 @@ def save_file_preview(db: Session, file_id: UUID, preview_data: bytes) -> FilePr
     db.add(preview)
     db.commit()
     db.refresh(preview)
+    write_preview_cache(file_id, preview_data)
 
     return preview
 
 
+def has_file_preview(db: Session, file_id: UUID) -> bool:
+    """
+    Check whether a file has a stored preview, without loading the image data.
+    """
+    return db.query(FilePreview.id).filter(FilePreview.file_id == file_id).first() is not None
+
+
+def get_preview_cache_path(file_id: UUID) -> Path:
+    """
+    Get the path of the on-disk copy of a file preview.
+    """
+    return settings.UPLOAD_PATH / "previews" / f"{file_id}.jpg"
+
+
+def write_preview_cache(file_id: UUID, preview_data: bytes) -> Path:
+    """
+    Write a file preview to disk so it can be served with sendfile.
+    The data is written to a temporary file first, so readers never see a partial preview.
+    """
+    path = get_preview_cache_path(file_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    tmp_path.write_bytes(preview_data)
+    os.replace(tmp_path, path)
+
+    return path
+
+
 def update_file_content(db: Session, file_id: UUID, content: str, file_type: FileType = None) -> File:
     """
     Update file content and optionally file type.
@@ -174,6 +234,17 @@ def update_file_content(db: Session, file_id: UUID, content: str, file_type: Fil
     return file
 
 
+def get_file_stat_result(file: File) -> Optional[os.stat_result]:
+    """
+    Stat an uploaded file on disk, so the response doesn't have to stat it again.
+    Returns None if the file is missing.
+    """
+    try:
+        return os.stat(file.path)
+    except FileNotFoundError:
+        return None
+
+
 def get_file_preview_url(file_id: UUID) -> str:
     """
     Get preview URL for a file.
@@ -1,5 +1,6 @@
 import json
 import logging
+import time
 from typing import Dict, Any, List, Optional
 from uuid import UUID
 
@@ -15,6 +16,9 @@ from app.services.chat_service import update_ai_message
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Redis client shared by the helpers below, created on first use
+redis_client: Optional[Redis] = None
+
 
 @shared_task
 def save_completed_message(message_id: str, content: str, sources: Optional[List[Dict[str, Any]]] = None) -> Optional[
@@ -123,30 +127,47 @@ def update_message_status(message_id: str, status: str) -> Optional[str]:
         db.close()
 
 
+def get_redis() -> Redis:
+    """
+    Get the shared Redis client. Its connection pool is bound to the event loop
+    it is first used on, which is the API server's loop.
+    """
+    global redis_client
+    if redis_client is None:
+        redis_client = Redis.from_url(
+            settings.REDIS_URL, max_connections=settings.REDIS_MAX_CONNECTIONS
+        )
+    return redis_client
+
+
+async def close_redis():
+    """Close the shared Redis client and its connections."""
+    global redis_client
+    if redis_client is not None:
+        await redis_client.close()
+        redis_client = None
+
+
 async def save_message_chunk_to_redis(message_id: str, chunk: str) -> bool:
     """
     Save a message chunk to Redis.
     This appends the new chunk to any existing content for this message.
     """
     try:
-        redis = Redis.from_url(settings.REDIS_URL)
+        redis = get_redis()
 
         # Create Redis key for this message
         redis_key = f"message:{message_id}"
-
-        # Append chunk to message content
-        await redis.append(redis_key, chunk)
-
-        # Set expiration (1 hour)
-        await redis.expire(redis_key, 3600)
-
-        # Also store a timestamp of the last update for this message
         timestamp_key = f"message:{message_id}:last_updated"
-        timestamp = await redis.time()
-        await redis.set(timestamp_key, int(timestamp[0]))
-        await redis.expire(timestamp_key, 3600)
 
-        await redis.close()
+        # Append chunk, refresh expiration (1 hour) and store a timestamp of the last update
+        # for this message in a single round-trip. The timestamp uses this process's clock,
+        # which clean_old_messages compares against
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.append(redis_key, chunk)
+            pipe.expire(redis_key, 3600)
+            pipe.set(timestamp_key, int(time.time()), ex=3600)
+            await pipe.execute()
 
         return True
 
@@ -160,7 +181,7 @@ async def get_message_content_from_redis(message_id: str) -> str:
     Get the complete message content from Redis.
     """
     try:
-        redis = Redis.from_url(settings.REDIS_URL)
+        redis = get_redis()
 
         # Create Redis key for this message
         redis_key = f"message:{message_id}"
@@ -168,7 +189,6 @@ async def get_message_content_from_redis(message_id: str) -> str:
         # Get message content
         content = await redis.get(redis_key)
 
-        await redis.close()
 
         if content:
             return content.decode('utf-8')
@@ -181,19 +201,76 @@ async def get_message_content_from_redis(message_id: str) -> str:
         return ""
 
 
+async def get_messages_content_from_redis(message_ids: List[str]) -> Dict[str, str]:
+    """
+    Get the content of several messages from Redis in a single MGET round-trip.
+    Messages without content in Redis are omitted from the result.
+    """
+    if not message_ids:
+        return {}
+
+    try:
+        redis = get_redis()
+
+        contents = await redis.mget([f"message:{message_id}" for message_id in message_ids])
+
+        return {
+            message_id: content.decode('utf-8')
+            for message_id, content in zip(message_ids, contents)
+            if content
+        }
+
+    except Exception as e:
+        logger.error(f"Error getting messages content from Redis: {str(e)}", exc_info=True)
+        return {}
+
+
+async def save_message_suggestions_to_redis(message_id: str, suggestions: List[str]) -> bool:
+    """
+    Save the suggestions returned by the AI service for a message to Redis,
+    so the completion callback can read them without querying the chat.
+    """
+    try:
+        redis = get_redis()
+
+        await redis.set(f"message:{message_id}:suggestions", json.dumps(suggestions), ex=3600)
+
+        return True
+
+    except Exception as e:
+        logger.error(f"Error saving message suggestions to Redis: {str(e)}", exc_info=True)
+        return False
+
+
+async def get_message_suggestions_from_redis(message_id: str) -> Optional[List[str]]:
+    """
+    Get the suggestions stored for a message in Redis, or None if there are none.
+    """
+    try:
+        redis = get_redis()
+
+        suggestions = await redis.get(f"message:{message_id}:suggestions")
+
+        return json.loads(suggestions) if suggestions else None
+
+    except Exception as e:
+        logger.error(f"Error getting message suggestions from Redis: {str(e)}", exc_info=True)
+        return None
+
+
 async def check_in_progress_messages() -> List[Dict[str, Any]]:
     """
     Check for all in-progress messages in Redis.
     Returns a list of message IDs and their content.
     """
     try:
-        redis = Redis.from_url(settings.REDIS_URL)
+        redis = get_redis()
 
         # Get all message keys
         keys = await redis.keys("message:*")
 
-        # Filter out timestamp keys
-        message_keys = [key for key in keys if b":last_updated" not in key]
+        # Filter out timestamp and suggestions keys
+        message_keys = [key for key in keys if key.count(b":") == 1]
 
         result = []
         for key in message_keys:
@@ -212,7 +289,6 @@ async def check_in_progress_messages() -> List[Dict[str, Any]]:
                     "last_updated": last_updated
                 })
 
-        await redis.close()
         return result
 
     except Exception as e:
@@ -226,10 +302,10 @@ async def clean_old_messages(older_than_seconds: int = 3600) -> int:
     Returns the number of keys removed.
     """
     try:
-        redis = Redis.from_url(settings.REDIS_URL)
+        redis = get_redis()
 
-        # Get current server time
-        current_time = int(redis.time()[0])
+        # Compare against the same clock save_message_chunk_to_redis stamps updates with
+        current_time = int(time.time())
 
         # Get all timestamp keys
         keys = await redis.keys("message:*:last_updated")
@@ -246,14 +322,14 @@ async def clean_old_messages(older_than_seconds: int = 3600) -> int:
                     # Extract message ID
                     message_id = key.decode('utf-8').split(':')[1]
 
-                    # Delete message content and timestamp
+                    # Delete message content, suggestions and timestamp
                     content_key = f"message:{message_id}"
                     await redis.delete(content_key)
+                    await redis.delete(f"message:{message_id}:suggestions")
                     await redis.delete(key)
 
                     removed += 1
 
-        await redis.close()
         return removed
 
     except Exception as e:
@@ -0,0 +1,31 @@
+"""source reference index
+
+Revision ID: 0c6d3e8a9f21
+Revises: f7b2c8d41e95
+Create Date: 2026-10-16 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c6d3e8a9f21'
+down_revision = 'f7b2c8d41e95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently so source inserts aren't blocked while the index is created
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_source_message_id_url', 'source', ['message_id', 'url'], unique=False,
+            postgresql_include=['title', 'content', 'document_dir', 'resolved_path'],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_source_message_id_url', table_name='source', postgresql_concurrently=True)
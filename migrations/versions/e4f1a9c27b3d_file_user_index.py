@@ -0,0 +1,24 @@
+"""file user index
+
+Revision ID: e4f1a9c27b3d
+Revises: c2e1de12d346
+Create Date: 2026-10-16 13:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f1a9c27b3d'
+down_revision = 'c2e1de12d346'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_file_user_id_created_at', 'file', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_user_id_created_at', table_name='file')
@@ -0,0 +1,26 @@
+"""source resolved reference
+
+Revision ID: f7b2c8d41e95
+Revises: e4f1a9c27b3d
+Create Date: 2026-10-16 14:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7b2c8d41e95'
+down_revision = 'e4f1a9c27b3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('source', sa.Column('document_dir', sa.String(), nullable=True))
+    op.add_column('source', sa.Column('resolved_path', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('source', 'resolved_path')
+    op.drop_column('source', 'document_dir')